@@ -1,15 +1,42 @@
 from __future__ import annotations
+import io
 import os
 import math
+from typing import Callable
+import numpy as np
 import pandas as pd
 from datetime import datetime, timezone
 from sqlalchemy.orm import Session
-from sqlalchemy import text
+from sqlalchemy import MetaData, Table, delete, insert, select, text
 
-from api.models import CustomerScore
+from api.config import settings
+from api.kpis import convo_kpis  # noqa: F401 - re-exported for existing callers
+from api.dashboard import segment_counts, top_at_risk, recent_negative_mentions  # noqa: F401 - same
+from api.models import CustomerScore, CustomerFingerprint
+from api.response_cache import response_cache
+from api.metrics import RFM_PHASE_SECONDS, RFM_ROWS_WRITTEN
+from db.database import begin_immediate, dialect_insert
 
 # CSV location (mount a 'data' folder at project root)
 CUSTOMERS_CSV = os.path.join(os.path.dirname(__file__), "../data/customers.csv")
+# Input actually read by run_rfm: CSV, Parquet or Arrow IPC (see _customer_format)
+CUSTOMERS_PATH = settings.CUSTOMERS_PATH or CUSTOMERS_CSV
+CUSTOMER_FORMATS = {".csv": "csv", ".parquet": "parquet", ".pq": "parquet",
+                    ".arrow": "arrow", ".feather": "arrow", ".ipc": "arrow"}
+
+REQUIRED_COLUMNS = ["id", "name", "email", "joined_at", "city", "age", "last_purchase_at", "total_orders", "total_spend"]
+# Only these feed the scores; the rest are validated but never loaded
+SCORING_DTYPES = {
+    "id": str,
+    "joined_at": str,
+    "last_purchase_at": str,
+    "total_orders": "float64",  # truncated like int() in _score_frame; NaN still fails loudly
+    "total_spend": "float64",
+}
+FINGERPRINT_COLUMNS = ["joined_at", "last_purchase_at", "total_orders", "total_spend"]
+SCORE_COLUMNS = ["user_id", "r_score", "f_score", "m_score", "propensity", "segment"]
+RECENCY_LIMITS = [30, 60, 120, 240]  # upper bounds (days) of recency buckets 5..2
+AT_RISK_TENURE = 180  # _segment's joined_days threshold
 
 
 def _now_utc():
@@ -68,95 +95,360 @@ def _segment(r: int, f: int, m: int, joined_at: str | None, days_since_last: int
         return "Hibernating"
     return "New"
 
-def run_rfm(db: Session) -> dict:
-    if not os.path.exists(CUSTOMERS_CSV):
-        raise FileNotFoundError(f"customers.csv not found at {CUSTOMERS_CSV}")
+# Offset suffix of an ISO-8601 date-time ("Z", "+05:30", "-0800", ...)
+_TZ_SUFFIX = r"(?:Z|[+-]\d{2}(?::?\d{2}(?::?\d{2}(?:\.\d+)?)?)?)$"
+
+def _days_since_series(values: pd.Series, now: datetime) -> np.ndarray:
+    """Vectorized _days_since: same day counts, 10_000 for missing/unparseable dates"""
+    # Dates repeat heavily, so normalize and parse each distinct value once
+    codes, uniques = pd.factorize(values, use_na_sentinel=True)
+    text = pd.Series(uniques, dtype=object).astype(str)
+    # _days_since drops the offset and keeps wall-clock time (replace(tzinfo=None)), so strip it
+    has_time = text.str.match(r"\d{4}-\d{2}-\d{2}[T ]")
+    text = text.where(~has_time, text.str.replace(_TZ_SUFFIX, "", regex=True))
+    text = text.where(text.str.match(r"\d{4}-\d{2}-\d{2}"))
+    parsed = pd.to_datetime(text, errors="coerce", format="ISO8601")
+    if pd.api.types.is_datetime64_dtype(parsed):
+        days = (pd.Timestamp(now) - parsed).dt.days.clip(lower=0).fillna(10_000)
+    else:
+        days = pd.Series(uniques, dtype=object).map(lambda v: _days_since(str(v)))
+    # Missing values (code -1) map to the sentinel slot appended at the end
+    lookup = np.append(days.to_numpy(dtype=np.int64), 10_000)
+    return lookup[codes]
+
+def _rescore_after(days: np.ndarray, joined_days: np.ndarray, now: datetime) -> pd.Series:
+    """Earliest time a row's scores could change with no input change (NaT = never).
+
+    Only recency and the At-Risk tenure check depend on the date. A row at
+    `days` (floored) crosses limit t strictly after now + (t - days) days.
+    """
+    wait = np.full(len(days), np.inf)
+    for limit in reversed(RECENCY_LIMITS):
+        wait = np.where(days <= limit, limit - days, wait)
+    wait = np.minimum(wait, np.where(joined_days <= AT_RISK_TENURE, AT_RISK_TENURE - joined_days, np.inf))
+    wait = pd.to_timedelta(np.where(np.isinf(wait), np.nan, wait), unit="D")
+    return pd.Timestamp(now) + pd.Series(wait)
+
+def _score_frame(df: pd.DataFrame, now: datetime | None = None, with_rescore: bool = False) -> pd.DataFrame:
+    """Columnar R/F/M scores, propensity and segment; matches the per-row helpers above"""
+    now = now or datetime.utcnow()
+    days = _days_since_series(df["last_purchase_at"], now)
+    joined_days = _days_since_series(df["joined_at"], now)
+    orders = df["total_orders"].astype(np.int64).to_numpy()
+    spend = df["total_spend"].astype(np.float64).to_numpy()
+
+    r = np.select([days <= 30, days <= 60, days <= 120, days <= 240], [5, 4, 3, 2], default=1)
+    f = np.select([orders > 20, orders >= 11, orders >= 6, orders >= 2], [5, 4, 3, 2], default=1)
+    m = np.select([spend > 50_000, spend >= 20_000, spend >= 10_000, spend >= 2_000], [5, 4, 3, 2], default=1)
+
+    z = 0.8 * r + 0.6 * f + 0.7 * m - 6.0
+    propensity = np.round(1.0 / (1.0 + np.exp(-z)), 4)
+
+    # Same precedence as _segment: first matching rule wins
+    segment = np.select(
+        [
+            (r >= 4) & ((f >= 4) | (m >= 4)),
+            (r >= 3) & (f >= 3) & (m >= 3),
+            (r <= 2) & ((f <= 2) | (m <= 2)) & (joined_days > 180),
+            (f <= 2) & (r <= 2),
+        ],
+        ["Champions", "Loyal", "At-Risk", "Hibernating"],
+        default="New",
+    )
+
+    scores = pd.DataFrame({
+        "user_id": df["id"].astype(str).to_numpy(),
+        "r_score": r,
+        "f_score": f,
+        "m_score": m,
+        "propensity": propensity,
+        "segment": segment,
+    })
+    if with_rescore:
+        scores["rescore_after"] = _rescore_after(days, joined_days, now).to_numpy()
+    return scores
+
+def _fingerprints(df: pd.DataFrame) -> np.ndarray:
+    """Stable 64-bit hash of each row's scoring inputs (signed, to fit a BIGINT)"""
+    return pd.util.hash_pandas_object(df[FINGERPRINT_COLUMNS], index=False).to_numpy().view(np.int64)
+
+def _records(frame: pd.DataFrame) -> list[dict]:
+    """DataFrame rows as dicts with NaN/NaT turned into None for the DB driver"""
+    if frame.isna().to_numpy().any():
+        frame = frame.astype(object).where(frame.notna(), None)
+    return frame.to_dict("records")
+
+def _sqlite_values(column: pd.Series) -> list:
+    """Column as Python values sqlite3 can bind (datetimes in SQLAlchemy's text format)"""
+    if pd.api.types.is_datetime64_any_dtype(column):
+        column = column.dt.strftime("%Y-%m-%d %H:%M:%S.%f")
+    return column.astype(object).where(column.notna(), None).tolist()
+
+def _upsert(db: Session, table: Table, rows: list[dict], key: str) -> None:
+    """INSERT ... ON CONFLICT (key) DO UPDATE for SQLite and Postgres"""
+    stmt = dialect_insert(db, table)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[key],
+        set_={c: stmt.excluded[c] for c in rows[0] if c != key},
+    )
+    db.execute(stmt, rows)
+
+class _SnapshotWriter:
+    """Bulk-loads a full replacement of `table` into a staging copy, then swaps it in.
+
+    Rows go in batches (executemany, or COPY on Postgres), each committed on
+    its own, so memory is bounded by the batch size and other writers only wait
+    for one batch, not the whole run. The swap (drop live table, rename staging,
+    rebuild indexes) runs in one transaction, so readers see either the old
+    snapshot or the new one, never an empty or partial table.
+    """
+
+    def __init__(self, db: Session, table: Table, columns: list[str],
+                 batch_size: int = settings.RFM_WRITE_BATCH_SIZE, upsert_key: str | None = None):
+        self.db = db
+        self.table = table
+        self.columns = columns
+        # Tables keyed by customer take the last row for a repeated id instead of failing
+        self.upsert_key = upsert_key
+        self.batch_size = batch_size
+        self.staging = table.to_metadata(MetaData(), name=f"{table.name}_staging")
+        self.staging.indexes.clear()  # built on the live name after the swap
+        self.dialect = db.get_bind().dialect.name
+        self.rows_written = 0
+
+    def begin(self) -> None:
+        conn = self.db.connection()
+        self.staging.drop(conn, checkfirst=True)
+        self.staging.create(conn)
+        self.db.commit()
+
+    def write(self, frame: pd.DataFrame) -> None:
+        for start in range(0, len(frame), self.batch_size):
+            batch = frame.iloc[start:start + self.batch_size][self.columns]
+            if self.upsert_key:
+                batch = batch.drop_duplicates(self.upsert_key, keep="last")
+            if self.dialect == "sqlite":
+                self._executemany(batch)
+            elif self.upsert_key:
+                _upsert(self.db, self.staging, _records(batch), self.upsert_key)
+            elif self.dialect == "postgresql":
+                self._copy(batch)
+            else:
+                self.db.execute(insert(self.staging), _records(batch))
+            self.db.commit()
+            self.rows_written += len(batch)
+            RFM_ROWS_WRITTEN.inc(self.table.name, amount=len(batch))
+
+    def _executemany(self, batch: pd.DataFrame) -> None:
+        """Plain DBAPI executemany with positional tuples; skips per-row SQLAlchemy param handling"""
+        cols = list(batch.columns)
+        sql = f"INSERT INTO {self.staging.name} ({', '.join(cols)}) VALUES ({', '.join('?' * len(cols))})"
+        if self.upsert_key:
+            updates = ", ".join(f"{c} = excluded.{c}" for c in cols if c != self.upsert_key)
+            sql += f" ON CONFLICT ({self.upsert_key}) DO UPDATE SET {updates}"
+        params = list(zip(*(_sqlite_values(batch[c]) for c in cols)))
+        self.db.connection().exec_driver_sql(sql, params)
+
+    def _copy(self, batch: pd.DataFrame) -> None:
+        buf = io.StringIO()
+        batch.to_csv(buf, index=False, header=False)
+        buf.seek(0)
+        cursor = self.db.connection().connection.cursor()
+        try:
+            cursor.copy_expert(
+                f"COPY {self.staging.name} ({', '.join(self.columns)}) FROM STDIN WITH (FORMAT csv)", buf
+            )
+        finally:
+            cursor.close()
 
-    df = pd.read_csv(CUSTOMERS_CSV)
-    req_cols = {"id","name","email","joined_at","city","age","last_purchase_at","total_orders","total_spend"}
-    missing = req_cols - set(df.columns)
+    def swap(self) -> None:
+        """Replace the live table; takes effect when the caller commits"""
+        begin_immediate(self.db)  # on SQLite the DDL would otherwise autocommit statement by statement
+        conn = self.db.connection()
+        conn.execute(text(f"DROP TABLE IF EXISTS {self.table.name}"))
+        conn.execute(text(f"ALTER TABLE {self.staging.name} RENAME TO {self.table.name}"))
+        for index in self.table.indexes:
+            index.create(conn)
+
+    def abort(self) -> None:
+        self.db.rollback()
+        self.staging.drop(self.db.connection(), checkfirst=True)
+        self.db.commit()
+
+def _customer_format(path: str) -> str:
+    """CUSTOMERS_FORMAT if set, otherwise guessed from the extension (default csv)"""
+    fmt = settings.CUSTOMERS_FORMAT or CUSTOMER_FORMATS.get(os.path.splitext(path)[1].lower(), "csv")
+    if fmt not in ("csv", "parquet", "arrow"):
+        raise ValueError(f"Unknown customers format {fmt!r}; expected csv, parquet or arrow")
+    return fmt
+
+def _check_columns(columns) -> None:
+    missing = set(REQUIRED_COLUMNS) - set(columns)
     if missing:
         raise ValueError(f"customers.csv missing columns: {sorted(missing)}")
 
-    # Compute R, F, M per row
-    rows = []
-    for _, r in df.iterrows():
-        days = _days_since(str(r.get("last_purchase_at")))
-        r_score = _bucket_recency(days)
-        f_score = _bucket_frequency(int(r.get("total_orders", 0)))
-        m_score = _bucket_monetary(float(r.get("total_spend", 0.0)))
-        prop = _propensity(r_score, f_score, m_score)
-        seg = _segment(r_score, f_score, m_score, str(r.get("joined_at")), days)
-        rows.append({
-            "user_id": str(r["id"]),
-            "r_score": r_score,
-            "f_score": f_score,
-            "m_score": m_score,
-            "propensity": float(prop),
-            "segment": seg
-        })
-
-    # Replace all rows (simple MVP: truncate + insert)
-    db.execute(text("DELETE FROM customer_scores"))
-    for row in rows:
-        db.add(CustomerScore(**row))
-    db.commit()
-
-    # Return quick counts
-    seg_counts = {}
-    for row in rows:
-        seg_counts[row["segment"]] = seg_counts.get(row["segment"], 0) + 1
+class _ArrowCustomerReader:
+    """Chunked reader for Parquet / Arrow IPC files with column projection.
+
+    Both are memory-mapped, and only the scoring columns are decoded.
+    """
+
+    def __init__(self, path: str, fmt: str, chunk_size: int):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError as e:
+            raise RuntimeError(f"Reading {fmt} customer files requires pyarrow (pip install pyarrow)") from e
+        self.chunk_size = chunk_size
+        self.columns = list(SCORING_DTYPES)
+        self._source = pa.memory_map(path, "r")
+        if fmt == "parquet":
+            self._file = pq.ParquetFile(self._source)
+            schema = self._file.schema_arrow
+        else:
+            self._file = pa.ipc.open_file(self._source)
+            schema = self._file.schema
+        _check_columns(schema.names)
+
+    def _batches(self):
+        if hasattr(self._file, "iter_batches"):
+            yield from self._file.iter_batches(batch_size=self.chunk_size, columns=self.columns)
+            return
+        for i in range(self._file.num_record_batches):
+            batch = self._file.get_batch(i).select(self.columns)
+            for offset in range(0, batch.num_rows, self.chunk_size):
+                yield batch.slice(offset, self.chunk_size)
+
+    def __iter__(self):
+        for batch in self._batches():
+            # Same dtypes as the CSV path so scores and fingerprints don't depend on the format
+            yield batch.to_pandas().astype({"total_orders": "float64", "total_spend": "float64"})
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self._source.close()
+
+def _read_customer_chunks(path: str, chunk_size: int):
+    """Validate the header, then return a reader yielding chunks of the scoring columns"""
+    fmt = _customer_format(path)
+    if fmt != "csv":
+        return _ArrowCustomerReader(path, fmt, chunk_size)
+    _check_columns(pd.read_csv(path, nrows=0).columns)
+    return pd.read_csv(path, usecols=list(SCORING_DTYPES), dtype=SCORING_DTYPES, chunksize=chunk_size)
+
+def run_rfm(db: Session, mode: str = "full", chunk_size: int = settings.RFM_CHUNK_SIZE,
+            progress: Callable[[int], None] | None = None) -> dict:
+    """Score the customers file (CSV, Parquet or Arrow) into customer_scores.
+
+    mode="full" rebuilds the table as an atomic snapshot. mode="incremental"
+    rescores only customers whose inputs changed (by fingerprint) or whose
+    buckets may have moved with the date, and upserts just those rows.
+    Customers that disappear from the file are only dropped by a full run.
+    progress, if given, is called with the running row count after each chunk.
+    """
+    if mode not in ("full", "incremental"):
+        raise ValueError(f"Unknown RFM mode {mode!r}; expected 'full' or 'incremental'")
+    if not os.path.exists(CUSTOMERS_PATH):
+        raise FileNotFoundError(f"customers file not found at {CUSTOMERS_PATH}")
+
+    now = datetime.utcnow()  # one reference time for every chunk
+    with _read_customer_chunks(CUSTOMERS_PATH, chunk_size) as reader:
+        chunks = RFM_PHASE_SECONDS.time_iter(reader, mode, "parse")
+        if mode == "incremental":
+            result = _run_rfm_incremental(db, chunks, now, progress)
+        else:
+            result = _run_rfm_full(db, chunks, now, progress)
+    response_cache.invalidate("analytics")
+    return result
+
+def _run_rfm_full(db: Session, chunks, now: datetime, progress: Callable[[int], None] | None) -> dict:
+    # Score chunk by chunk into staging tables, then swap them in atomically;
+    # peak memory depends on chunk_size, not on the file size
+    scores_writer = _SnapshotWriter(db, CustomerScore.__table__, SCORE_COLUMNS)
+    prints_writer = _SnapshotWriter(db, CustomerFingerprint.__table__, ["user_id", "fingerprint", "rescore_after"],
+                                    upsert_key="user_id")
+    seg_counts: dict[str, int] = {}
+    try:
+        scores_writer.begin()
+        prints_writer.begin()
+        for chunk in chunks:
+            with RFM_PHASE_SECONDS.time("full", "score"):
+                scores = _score_frame(chunk, now, with_rescore=True)
+                scores["fingerprint"] = _fingerprints(chunk)
+            with RFM_PHASE_SECONDS.time("full", "write"):
+                scores_writer.write(scores)
+                prints_writer.write(scores)
+            for seg, c in scores["segment"].value_counts(sort=False).items():
+                seg_counts[seg] = seg_counts.get(seg, 0) + int(c)
+            if progress:
+                progress(scores_writer.rows_written)
+        with RFM_PHASE_SECONDS.time("full", "swap"):
+            scores_writer.swap()
+            prints_writer.swap()
+            db.commit()
+    except Exception:
+        scores_writer.abort()
+        prints_writer.abort()
+        raise
 
     return {
-        "total": len(rows),
+        "mode": "full",
+        "total": scores_writer.rows_written,
         "segments": seg_counts
     }
 
-def convo_kpis(db: Session) -> dict:
-    # Aggregate from messages + feedback
-    # total, escalation_rate (< threshold), avg_confidence, helpful_rate
-    threshold = 30.0  # Default confidence threshold
-    total = db.execute(text("SELECT COUNT(*) FROM messages")).scalar_one()
-    low = db.execute(text("SELECT COUNT(*) FROM messages WHERE confidence IS NOT NULL AND confidence < :t"), {"t": threshold}).scalar_one()
-    avg_conf = db.execute(text("SELECT AVG(confidence) FROM messages")).scalar_one() or 0.0
+def _stored_fingerprints(db: Session, user_ids: list[str]) -> pd.DataFrame:
+    frames = []
+    for start in range(0, len(user_ids), 500):  # stay under SQLite's bound-parameter limit
+        rows = db.execute(
+            select(CustomerFingerprint.user_id, CustomerFingerprint.fingerprint, CustomerFingerprint.rescore_after)
+            .where(CustomerFingerprint.user_id.in_(user_ids[start:start + 500]))
+        ).all()
+        if rows:  # concat of empty frames is deprecated in pandas
+            frames.append(pd.DataFrame(rows, columns=["user_id", "stored", "rescore_after"]))
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=["user_id", "stored", "rescore_after"])
 
-    # helpful rate
-    fb_total = db.execute(text("SELECT COUNT(*) FROM feedback")).scalar_one()
-    fb_help = db.execute(text("SELECT COUNT(*) FROM feedback WHERE helpful = TRUE")).scalar_one()
-    helpful_rate = (fb_help / fb_total) if fb_total else None
+def _run_rfm_incremental(db: Session, chunks, now: datetime, progress: Callable[[int], None] | None) -> dict:
+    scanned = rescored = 0
+    for chunk in chunks:
+        scanned += len(chunk)
+        if progress:
+            progress(scanned)
+        user_ids = chunk["id"].astype(str)
+        with RFM_PHASE_SECONDS.time("incremental", "compare"):
+            stored = _stored_fingerprints(db, user_ids.tolist()).set_index("user_id")
+            fingerprint = _fingerprints(chunk)
+
+        # Nullable Int64 keeps all 64 bits; unknown customers compare as NA -> changed
+        previous = stored["stored"].astype("Int64").reindex(user_ids).array
+        modified = (previous != fingerprint).fillna(True).to_numpy(dtype=bool)
+        due = pd.to_datetime(stored["rescore_after"].reindex(user_ids)).to_numpy() <= np.datetime64(now)
+        changed = modified | due
+        if not changed.any():
+            continue
+
+        with RFM_PHASE_SECONDS.time("incremental", "score"):
+            scores = _score_frame(chunk[changed], now, with_rescore=True)
+            scores["fingerprint"] = fingerprint[changed]
+        with RFM_PHASE_SECONDS.time("incremental", "write"):
+            ids = scores["user_id"].tolist()
+            for start in range(0, len(ids), 500):
+                db.execute(delete(CustomerScore).where(CustomerScore.user_id.in_(ids[start:start + 500])))
+            db.execute(insert(CustomerScore), _records(scores[SCORE_COLUMNS]))
+            prints = scores[["user_id", "fingerprint", "rescore_after"]].drop_duplicates("user_id", keep="last")
+            _upsert(db, CustomerFingerprint.__table__, _records(prints), "user_id")
+            db.commit()
+        RFM_ROWS_WRITTEN.inc(CustomerScore.__tablename__, amount=len(scores))
+        RFM_ROWS_WRITTEN.inc(CustomerFingerprint.__tablename__, amount=len(prints))
+        rescored += len(scores)
 
     return {
-        "total": int(total),
-        "escalation_rate": round((low / total), 4) if total else 0.0,
-        "avg_confidence": round(float(avg_conf), 4) if avg_conf else 0.0,
-        "helpful_rate": round(float(helpful_rate), 4) if helpful_rate is not None else None
+        "mode": "incremental",
+        "total": scanned,
+        "scanned": scanned,
+        "rescored": rescored,
+        "skipped": scanned - rescored,
+        "segments": segment_counts(db)
     }
-
-def segment_counts(db: Session) -> dict:
-    rows = db.execute(text("SELECT segment, COUNT(*) FROM customer_scores GROUP BY segment")).all()
-    return {seg: int(c) for seg, c in rows}
-
-def top_at_risk(db: Session, limit: int = 10) -> list[dict]:
-    q = text("""
-        SELECT user_id, r_score, f_score, m_score, propensity, segment
-        FROM customer_scores
-        ORDER BY propensity ASC, r_score ASC
-        LIMIT :lim
-    """)
-    res = db.execute(q, {"lim": limit}).mappings().all()
-    return [dict(r) for r in res]
-
-def recent_negative_mentions(db: Session, limit: int = 5) -> list[dict]:
-    # May not exist yet; handle gracefully
-    try:
-        q = text("""
-          SELECT title, source, url, sentiment, topic
-          FROM mentions
-          WHERE sentiment <= -0.6 OR (is_misinfo = TRUE)
-          ORDER BY created_at DESC
-          LIMIT :lim
-        """)
-        res = db.execute(q, {"lim": limit}).mappings().all()
-        return [dict(r) for r in res]
-    except Exception:
-        return []
@@ -4,8 +4,17 @@ from dotenv import load_dotenv
 load_dotenv()
 
 class Settings:
-    # Database
-    DATABASE_URL: str = os.getenv("DATABASE_URL", "sqlite:///customer_ai.db")
+    # Database (empty = customer_ai.db at the repo root)
+    DATABASE_URL: str = os.getenv("DATABASE_URL", "")
+    DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", "5"))
+    DB_MAX_OVERFLOW: int = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+    DB_POOL_TIMEOUT: float = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+    DB_POOL_RECYCLE: int = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+    DB_POOL_PRE_PING: bool = os.getenv("DB_POOL_PRE_PING", "True").lower() == "true"
+    # SQLite only
+    SQLITE_BUSY_TIMEOUT_MS: int = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+    SQLITE_CACHE_SIZE: int = int(os.getenv("SQLITE_CACHE_SIZE", "-65536"))  # negative = KiB
+    SQLITE_MMAP_SIZE: int = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
 
     # App settings
     APP_NAME: str = os.getenv("APP_NAME", "Mini Customer AI")
@@ -13,6 +22,10 @@ class Settings:
     APP_HOST: str = os.getenv("APP_HOST", "0.0.0.0")
     APP_PORT: int = int(os.getenv("APP_PORT", "8000"))
 
+    # Routers this worker serves, comma-separated: chat, feedback, generate, analytics,
+    # reputation, admin, metrics, or "all". Modules of disabled routers are never imported.
+    ENABLED_ROUTERS: str = os.getenv("ENABLED_ROUTERS", "all")
+
     # Security
     SECRET_KEY: str = os.getenv("SECRET_KEY", "your-secret-key-here")
 
@@ -20,8 +33,81 @@ class Settings:
     BRAND_NAME: str = os.getenv("BRAND_NAME", "MYAISTORE")
     CONFIDENCE_THRESHOLD: float = float(os.getenv("CONFIDENCE_THRESHOLD", "0.55"))
 
+    # FAQ matching: "keyword" (exact keyword overlap) or "bm25" (question + keywords)
+    FAQ_MATCHER: str = os.getenv("FAQ_MATCHER", "keyword").lower()
+    # FAQ matching cache (seconds between catalog generation checks)
+    FAQ_CACHE_CHECK_INTERVAL: float = float(os.getenv("FAQ_CACHE_CHECK_INTERVAL", "1.0"))
+
     # Analytics
-    CUSTOMERS_CSV: str = os.getenv("CUSTOMERS_CSV", "/data/customers.csv")
+    # Overrides the bundled data/customers.csv; .csv, .parquet or .arrow/.feather/.ipc
+    CUSTOMERS_PATH: str = os.getenv("CUSTOMERS_PATH", "")
+    # Force "csv", "parquet" or "arrow" instead of detecting by extension
+    CUSTOMERS_FORMAT: str = os.getenv("CUSTOMERS_FORMAT", "").lower()
+    RFM_CHUNK_SIZE: int = int(os.getenv("RFM_CHUNK_SIZE", "100000"))
+    RFM_WRITE_BATCH_SIZE: int = int(os.getenv("RFM_WRITE_BATCH_SIZE", "5000"))
+
+    # Set by gunicorn.conf.py after its master has created the tables and backfilled the
+    # KPI rollup, so workers skip those steps instead of running the DDL concurrently
+    SCHEMA_READY: bool = os.getenv("SCHEMA_READY", "") == "1"
+
+    # Where caches that every worker should share live (response cache, FAQ matcher
+    # snapshots, job status): "memory" (this process only) or "file" (a directory on
+    # tmpfs seen by all workers on the host; gunicorn.conf.py defaults to it)
+    CACHE_BACKEND: str = os.getenv("CACHE_BACKEND", "memory").lower()
+    CACHE_DIR: str = os.getenv("CACHE_DIR", "")  # default /dev/shm/ai_store-<uid>; must be ours, mode 0700
+
+    # Seconds /analytics/summary and /reputation/summary responses are cached
+    RESPONSE_CACHE_TTL: float = float(os.getenv("RESPONSE_CACHE_TTL", "10.0"))
+    # Largest ?limit= accepted by the cursor-paginated list endpoints
+    PAGE_SIZE_MAX: int = int(os.getenv("PAGE_SIZE_MAX", "500"))
+    # Rows fetched per server-side cursor round trip by the NDJSON export endpoints
+    EXPORT_CHUNK_ROWS: int = int(os.getenv("EXPORT_CHUNK_ROWS", "1000"))
+
+    # Write-behind chat logging: reply before the messages row is committed
+    MESSAGE_WRITE_BEHIND: bool = os.getenv("MESSAGE_WRITE_BEHIND", "False").lower() == "true"
+    MESSAGE_FLUSH_BATCH: int = int(os.getenv("MESSAGE_FLUSH_BATCH", "500"))
+    MESSAGE_FLUSH_INTERVAL: float = float(os.getenv("MESSAGE_FLUSH_INTERVAL", "0.2"))
+    MESSAGE_QUEUE_MAX: int = int(os.getenv("MESSAGE_QUEUE_MAX", "10000"))
+    MESSAGE_QUEUE_TIMEOUT: float = float(os.getenv("MESSAGE_QUEUE_TIMEOUT", "5.0"))
+    MESSAGE_ID_BLOCK: int = int(os.getenv("MESSAGE_ID_BLOCK", "100"))
+    # A batch that still fails after this many attempts is written row by row; rows that
+    # fail on their own are appended to MESSAGE_DEAD_LETTER_PATH (JSONL) and dropped
+    MESSAGE_FLUSH_RETRIES: int = int(os.getenv("MESSAGE_FLUSH_RETRIES", "5"))
+    MESSAGE_DEAD_LETTER_PATH: str = os.getenv(
+        "MESSAGE_DEAD_LETTER_PATH",
+        os.path.join(os.path.dirname(__file__), "..", "data", "message_dead_letter.jsonl")
+    )
+    # With several workers a message can still be queued in another one: feedback for an
+    # id that has been allocated but not yet written waits this long for it to land
+    FEEDBACK_PENDING_WAIT: float = float(os.getenv("FEEDBACK_PENDING_WAIT", "2.0"))
+
+    # Reputation lexicons (sentiment / topic / misinformation terms), reloaded on change
+    LEXICON_PATH: str = os.getenv("LEXICON_PATH", os.path.join(os.path.dirname(__file__), "lexicons.json"))
+    LEXICON_CHECK_INTERVAL: float = float(os.getenv("LEXICON_CHECK_INTERVAL", "2.0"))
+
+    # Bulk mention ingestion (/reputation/analyze/batch, ingest_mentions.py)
+    MENTION_BATCH_SIZE: int = int(os.getenv("MENTION_BATCH_SIZE", "1000"))
+    # Analysis processes; 0 = analyze in the calling thread (the default on a single core,
+    # where the pool only adds pickling overhead)
+    MENTION_WORKERS: int = int(os.getenv("MENTION_WORKERS", str(min((os.cpu_count() or 1) - 1, 4))))
+    # Larger uploads are spooled to disk and ingested as a background job
+    MENTION_SYNC_LIMIT: int = int(os.getenv("MENTION_SYNC_LIMIT", "1000"))
+
+    # Content generation templates (api/prompts): compiled to Python modules under
+    # TEMPLATE_COMPILED_DIR ("" = compile in memory), rendered output kept in an LRU.
+    # The modules are imported, so the directory must be private to the server's user
+    TEMPLATE_COMPILED_DIR: str = os.getenv(
+        "TEMPLATE_COMPILED_DIR",
+        os.path.join(os.getenv("XDG_CACHE_HOME") or os.path.expanduser("~/.cache"), "ai_store", "templates")
+    )
+    TEMPLATE_CACHE_SIZE: int = int(os.getenv("TEMPLATE_CACHE_SIZE", "1024"))
+    TEMPLATE_CHECK_INTERVAL: float = float(os.getenv("TEMPLATE_CHECK_INTERVAL", "2.0"))
+    # Most variants accepted by one /generate/batch call
+    GENERATE_BATCH_MAX: int = int(os.getenv("GENERATE_BATCH_MAX", "1000"))
+
+    # Background jobs (analytics runs)
+    JOB_WORKERS: int = int(os.getenv("JOB_WORKERS", "2"))
+    JOB_HISTORY: int = int(os.getenv("JOB_HISTORY", "100"))
 
     # Debug
     DEBUG: bool = os.getenv("DEBUG", "True").lower() == "true"
@@ -0,0 +1,37 @@
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from api.models import NEGATIVE_MENTION
+
+# Dashboard queries, kept apart from api.analytics so serving the summary doesn't
+# import pandas; only RFM runs need it
+
+def segment_counts(db: Session) -> dict:
+    rows = db.execute(text("SELECT segment, COUNT(*) FROM customer_scores GROUP BY segment")).all()
+    return {seg: int(c) for seg, c in rows}
+
+def top_at_risk(db: Session, limit: int = 10) -> list[dict]:
+    q = text("""
+        SELECT user_id, r_score, f_score, m_score, propensity, segment
+        FROM customer_scores
+        ORDER BY propensity ASC, r_score ASC
+        LIMIT :lim
+    """)
+    res = db.execute(q, {"lim": limit}).mappings().all()
+    return [dict(r) for r in res]
+
+def recent_negative_mentions(db: Session, limit: int = 5) -> list[dict]:
+    # May not exist yet; handle gracefully
+    try:
+        # Served by the ix_mentions_negative_created_at partial index
+        q = text(f"""
+          SELECT title, source, url, sentiment, topic
+          FROM mentions
+          WHERE {NEGATIVE_MENTION}
+          ORDER BY created_at DESC, id DESC
+          LIMIT :lim
+        """)
+        res = db.execute(q, {"lim": limit}).mappings().all()
+        return [dict(r) for r in res]
+    except Exception:
+        return []
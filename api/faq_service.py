@@ -1,8 +1,368 @@
-from typing import List, Tuple, Optional
+from abc import ABC, abstractmethod
+from typing import Dict, List, Set, Tuple, Optional
+from sqlalchemy import select, func
 from sqlalchemy.orm import Session
-from .models import FAQ
+from .config import settings
+from .models import FAQ, FAQChange
+from .metrics import FAQ_CANDIDATES
+from . import shared_store
+import heapq
+import pickle
 import re
+import threading
+import time
 from collections import Counter
+from datetime import datetime, timezone
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase, strip punctuation and split on whitespace"""
+    return re.sub(r'[^\w\s]', '', text.lower()).split()
+
+Match = Tuple[int, str, float]  # (faq_id, answer, confidence 0-100)
+
+class FAQMatcher(ABC):
+    """Base class for FAQ matchers; confidence is always on a 0-100 scale"""
+
+    @classmethod
+    def from_faqs(cls, faqs: List[FAQ]) -> "FAQMatcher":
+        matcher = cls()
+        for faq in faqs:
+            matcher.add(faq)
+        matcher.prepare()
+        return matcher
+
+    @abstractmethod
+    def add(self, faq: FAQ) -> None:
+        """Index faq, replacing an earlier version with the same id"""
+
+    @abstractmethod
+    def remove(self, faq_id: int) -> None:
+        """Drop faq_id from the index; a no-op if it isn't there"""
+
+    def prepare(self) -> None:
+        """Finish pending updates; called before the matcher is used for queries"""
+
+    @abstractmethod
+    def top_k(self, user_words: List[str], k: int = 5) -> List[Match]:
+        """Up to k matches, best first; ties go to the lowest FAQ id"""
+
+    def match(self, user_words: List[str]) -> Tuple[Optional[str], float]:
+        best = self.top_k(user_words, 1)
+        if not best:
+            return None, 0.0
+        return best[0][1], best[0][2]
+
+
+class KeywordMatcher(FAQMatcher):
+    """Inverted keyword index over the FAQ catalog (keyword -> FAQ ids with keyword counts).
+
+    Scores exactly like FAQService.calculate_confidence, but only for FAQs
+    sharing a token with the query. Once the matcher is in service, postings
+    are replaced rather than mutated, so queries running in other threads
+    never see a dict change under them; from_faqs() fills a matcher nobody
+    else can see yet in place, keeping full builds linear.
+    """
+
+    def __init__(self):
+        self.postings: Dict[str, Dict[int, int]] = {}
+        self.keyword_counts: Dict[int, Counter] = {}
+        self.keyword_totals: Dict[int, int] = {}
+        self.answers: Dict[int, str] = {}
+
+    @classmethod
+    def from_faqs(cls, faqs: List[FAQ]) -> "KeywordMatcher":
+        matcher = cls()
+        for faq in faqs:
+            matcher.remove(faq.id)
+            for keyword, count in matcher._index(faq).items():
+                matcher.postings.setdefault(keyword, {})[faq.id] = count
+        return matcher
+
+    def add(self, faq: FAQ) -> None:
+        """Index one FAQ, precomputing its keyword counts"""
+        self.remove(faq.id)
+        for keyword, count in self._index(faq).items():
+            posting = dict(self.postings.get(keyword, {}))
+            posting[faq.id] = count
+            self.postings[keyword] = posting
+
+    def _index(self, faq: FAQ) -> Counter:
+        keywords = faq.keywords_list
+        counts = Counter(keywords)
+        self.answers[faq.id] = faq.answer
+        self.keyword_totals[faq.id] = len(keywords)
+        self.keyword_counts[faq.id] = counts
+        return counts
+
+    def remove(self, faq_id: int) -> None:
+        """Drop one FAQ from the index (no-op if it is not indexed)"""
+        counts = self.keyword_counts.pop(faq_id, None)
+        if counts is None:
+            return
+        for keyword in counts:
+            posting = {i: n for i, n in self.postings[keyword].items() if i != faq_id}
+            if posting:
+                self.postings[keyword] = posting
+            else:
+                del self.postings[keyword]
+        self.answers.pop(faq_id, None)
+        self.keyword_totals.pop(faq_id, None)
+
+    def __len__(self) -> int:
+        return len(self.answers)
+
+    def top_k(self, user_words: List[str], k: int = 5) -> List[Match]:
+        if not user_words:
+            return []
+
+        # Intersection size per candidate FAQ: sum of min(user count, keyword count)
+        matches: Dict[int, int] = {}
+        for word, user_count in Counter(user_words).items():
+            for faq_id, keyword_count in self.postings.get(word, {}).items():
+                matches[faq_id] = matches.get(faq_id, 0) + min(user_count, keyword_count)
+
+        FAQ_CANDIDATES.inc("keyword", amount=len(matches))
+        scored = []
+        for faq_id, n in matches.items():
+            total = self.keyword_totals.get(faq_id)
+            answer = self.answers.get(faq_id)
+            if total and answer is not None:  # skip an FAQ removed while we were scoring
+                scored.append((faq_id, answer, min((n / total) * 100, 100.0)))
+        # Ties go to the lowest id, like the old scan over the table
+        return heapq.nsmallest(k, scored, key=lambda m: (-m[2], m[0]))
+
+
+class BM25Matcher(FAQMatcher):
+    """Okapi BM25 over each FAQ's question text plus keywords.
+
+    Documents are kept as a sparse CSR matrix of per-term BM25 weights, so a
+    query is scored against the whole catalog with one matrix-vector product.
+    Confidence is the query's score relative to the FAQ's own score (all of
+    its terms present), giving the same 0-100 scale as the keyword matcher.
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        # numpy/scipy load with the first BM25 matcher, not with every worker that imports this module
+        import numpy as np
+        from scipy import sparse
+        self.k1 = k1
+        self.b = b
+        self.docs: Dict[int, Counter] = {}
+        self.answers: Dict[int, str] = {}
+        self._dirty = True
+        # (ids, vocab, weights, norms, answers), swapped in one assignment by prepare()
+        self._state = (np.zeros(0, dtype=np.int64), {}, sparse.csr_matrix((0, 0)), np.zeros(0), {})
+
+    def add(self, faq: FAQ) -> None:
+        terms = tokenize(faq.question or "")
+        for keyword in faq.keywords_list:
+            terms.extend(tokenize(str(keyword)))
+        self.docs[faq.id] = Counter(terms)
+        self.answers[faq.id] = faq.answer
+        self._dirty = True
+
+    def remove(self, faq_id: int) -> None:
+        if self.docs.pop(faq_id, None) is not None:
+            del self.answers[faq_id]
+            self._dirty = True
+
+    def prepare(self) -> None:
+        """Rebuild the weight matrix; IDF is global, so any catalog change touches every row"""
+        import numpy as np
+        from scipy import sparse
+        if not self._dirty:
+            return
+        ids = sorted(self.docs)
+        vocab: Dict[str, int] = {}
+        rows, cols, tfs = [], [], []
+        for row, faq_id in enumerate(ids):
+            for term, tf in self.docs[faq_id].items():
+                rows.append(row)
+                cols.append(vocab.setdefault(term, len(vocab)))
+                tfs.append(tf)
+
+        shape = (len(ids), len(vocab))
+        tf = np.asarray(tfs, dtype=np.float64)
+        rows = np.asarray(rows, dtype=np.int64)
+        cols = np.asarray(cols, dtype=np.int64)
+        doc_len = np.bincount(rows, weights=tf, minlength=len(ids))
+        avg_len = doc_len.mean() if len(ids) else 0.0
+        df = np.bincount(cols, minlength=len(vocab))
+        idf = np.log1p((len(ids) - df + 0.5) / (df + 0.5))
+        length_norm = 1 - self.b + self.b * (doc_len[rows] / avg_len if avg_len else 0.0)
+        weights = idf[cols] * tf * (self.k1 + 1) / (tf + self.k1 * length_norm)
+
+        matrix = sparse.csr_matrix((weights, (rows, cols)), shape=shape)
+        norms = np.asarray(matrix.sum(axis=1)).ravel()
+        self._state = (np.asarray(ids, dtype=np.int64), vocab, matrix, norms, dict(self.answers))
+        self._dirty = False
+
+    def __len__(self) -> int:
+        return len(self.docs)
+
+    def top_k(self, user_words: List[str], k: int = 5) -> List[Match]:
+        import numpy as np
+        ids, vocab, matrix, norms, answers = self._state
+        cols = sorted({vocab[w] for w in user_words if w in vocab})
+        if not cols:
+            return []
+        query = np.zeros(len(vocab))
+        query[cols] = 1.0
+        scores = matrix @ query
+
+        hits = np.flatnonzero(scores > 0)
+        FAQ_CANDIDATES.inc("bm25", amount=len(hits))
+        confidence = np.minimum(scores[hits] / norms[hits] * 100, 100.0)
+        # Highest confidence first, lowest id on ties
+        order = np.lexsort((ids[hits], -confidence))[:k]
+        return [
+            (int(ids[hits[i]]), answers[int(ids[hits[i]])], float(confidence[i]))
+            for i in order
+        ]
+
+
+MATCHERS = {
+    "keyword": KeywordMatcher,
+    "bm25": BM25Matcher,
+}
+
+
+class FAQCache:
+    """Process-wide FAQ matcher kept in sync with the faq_changes feed.
+
+    The catalog generation is MAX(faq_changes.id). Workers compare it with the
+    generation they built from at most once per FAQ_CACHE_CHECK_INTERVAL seconds
+    and re-index only the FAQ ids that changed in between.
+
+    With a shared store, a full build is published there as a pickled snapshot,
+    and a worker that needs a full build for the same generation loads it
+    instead of re-indexing the catalog. reload() also bumps a shared version
+    that every other worker checks on its next refresh, so an admin reload
+    reaches all of them.
+    """
+
+    # Above this many changed FAQs (or this share of the catalog) a full rebuild is cheaper
+    MAX_INCREMENTAL = 500
+    MAX_INCREMENTAL_RATIO = 0.25
+
+    def __init__(self, matcher: str = settings.FAQ_MATCHER,
+                 check_interval: float = settings.FAQ_CACHE_CHECK_INTERVAL, store=None):
+        if matcher not in MATCHERS:
+            raise ValueError(f"Unknown FAQ matcher {matcher!r}; expected one of {sorted(MATCHERS)}")
+        self.mode = matcher
+        self.check_interval = check_interval
+        self.store = store if store is not None else shared_store.store
+        self._reload_version = self.store.version("faq-reload")
+        self._lock = threading.Lock()
+        self._matcher = None
+        self.generation = 0
+        self.built_at: Optional[datetime] = None
+        self.refreshed_at: Optional[datetime] = None
+        self._checked_at = 0.0
+        self.full_builds = 0
+        self.snapshot_loads = 0
+        self.incremental_refreshes = 0
+
+    def get_matcher(self, db: Session):
+        """Return the matcher, picking up catalog changes if the check interval has elapsed"""
+        matcher = self._matcher
+        if matcher is not None and time.monotonic() - self._checked_at < self.check_interval:
+            return matcher
+        with self._lock:
+            if self._matcher is None or time.monotonic() - self._checked_at >= self.check_interval:
+                self._refresh(db)
+            return self._matcher
+
+    def reload(self, db: Session):
+        """Force a full rebuild from the database, here now and in every other worker on its next check"""
+        with self._lock:
+            self.store.bump("faq-reload")
+            self._reload_version = self.store.version("faq-reload")
+            self._rebuild(db, self._current_generation(db), from_snapshot=False)
+            return self._matcher
+
+    def reset(self) -> None:
+        """Drop the matcher so the next request rebuilds it"""
+        with self._lock:
+            self._matcher = None
+            self.generation = 0
+
+    def stats(self) -> dict:
+        return {
+            "matcher": self.mode,
+            "generation": self.generation,
+            "faq_count": len(self._matcher) if self._matcher is not None else 0,
+            "built_at": self.built_at,
+            "refreshed_at": self.refreshed_at,
+            "full_builds": self.full_builds,
+            "snapshot_loads": self.snapshot_loads,
+            "shared": self.store.shared,
+            "incremental_refreshes": self.incremental_refreshes,
+            "check_interval": self.check_interval,
+        }
+
+    def _current_generation(self, db: Session) -> int:
+        return db.execute(select(func.max(FAQChange.id))).scalar() or 0
+
+    def _refresh(self, db: Session) -> None:
+        generation = self._current_generation(db)
+        self._checked_at = time.monotonic()
+        reload_version = self.store.version("faq-reload")
+        if self._matcher is None or generation < self.generation or reload_version != self._reload_version:
+            self._reload_version = reload_version
+            self._rebuild(db, generation)
+        elif generation > self.generation:
+            changed = set(db.execute(
+                select(FAQChange.faq_id)
+                .where(FAQChange.id > self.generation, FAQChange.id <= generation)
+                .distinct()
+            ).scalars())
+            too_many = max(self.MAX_INCREMENTAL, len(self._matcher) * self.MAX_INCREMENTAL_RATIO)
+            if None in changed or len(changed) > too_many:
+                self._rebuild(db, generation)
+            else:
+                self._apply_changes(db, changed, generation)
+
+    def _rebuild(self, db: Session, generation: int, from_snapshot: bool = True) -> None:
+        matcher = self._load_snapshot(generation) if from_snapshot else None
+        if matcher is not None:
+            self.snapshot_loads += 1
+        else:
+            # Generation is read before the rows, so a concurrent edit is re-applied next check, never lost
+            matcher = MATCHERS[self.mode].from_faqs(db.query(FAQ).order_by(FAQ.id).all())
+            self.full_builds += 1
+            if self.store.shared:
+                self.store.put(f"faq-matcher:{self.mode}", pickle.dumps((generation, matcher), pickle.HIGHEST_PROTOCOL))
+        self._matcher = matcher
+        self.generation = generation
+        self.built_at = self.refreshed_at = datetime.now(timezone.utc)
+        self._checked_at = time.monotonic()
+
+    def _load_snapshot(self, generation: int):
+        """Another worker's full build for this generation, if the shared store has one"""
+        if not self.store.shared:
+            return None
+        raw = self.store.get(f"faq-matcher:{self.mode}")
+        if raw is None:
+            return None
+        built_for, matcher = pickle.loads(raw)
+        return matcher if built_for == generation else None
+
+    def _apply_changes(self, db: Session, faq_ids: Set[int], generation: int) -> None:
+        rows = {faq.id: faq for faq in db.query(FAQ).filter(FAQ.id.in_(faq_ids)).all()}
+        for faq_id in faq_ids:
+            faq = rows.get(faq_id)
+            if faq is None:
+                self._matcher.remove(faq_id)
+            else:
+                self._matcher.add(faq)
+        self._matcher.prepare()
+        self.generation = generation
+        self.refreshed_at = datetime.now(timezone.utc)
+        self.incremental_refreshes += 1
+
+
+faq_cache = FAQCache()
 
 class FAQService:
     def __init__(self, db: Session):
@@ -10,8 +370,7 @@ class FAQService:
 
     def preprocess_text(self, text: str) -> List[str]:
         """Preprocess text by removing punctuation and converting to lowercase"""
-        text = re.sub(r'[^\w\s]', '', text.lower())
-        return text.split()
+        return tokenize(text)
 
     def calculate_confidence(self, user_words: List[str], faq_keywords: List[str]) -> float:
         """Calculate confidence score based on keyword matching"""
@@ -37,18 +396,8 @@ class FAQService:
         """Find the best matching FAQ with confidence score"""
         user_words = self.preprocess_text(user_message)
 
-        # Get all FAQs from database
-        faqs = self.db.query(FAQ).all()
-
-        best_match = None
-        best_confidence = 0.0
-
-        for faq in faqs:
-            confidence = self.calculate_confidence(user_words, faq.keywords_list)
-
-            if confidence > best_confidence:
-                best_confidence = confidence
-                best_match = faq.answer
+        # Only FAQs sharing a keyword with the message are scored
+        best_match, best_confidence = faq_cache.get_matcher(self.db).match(user_words)
 
         # Only return match if confidence is above threshold
         if best_confidence > 0.0:  # Any match
@@ -56,6 +405,20 @@ class FAQService:
 
         return None, 0.0
 
+    def find_best_matches(self, user_messages: List[str]) -> List[Tuple[Optional[str], float]]:
+        """find_best_match for many messages, checking the catalog for changes only once"""
+        matcher = faq_cache.get_matcher(self.db)
+        results = []
+        for message in user_messages:
+            best_match, best_confidence = matcher.match(self.preprocess_text(message))
+            results.append((best_match, best_confidence) if best_confidence > 0.0 else (None, 0.0))
+        return results
+
+    def find_top_matches(self, user_message: str, k: int = 5) -> List[Match]:
+        """Return up to k (faq_id, answer, confidence) matches, best first"""
+        user_words = self.preprocess_text(user_message)
+        return faq_cache.get_matcher(self.db).top_k(user_words, k)
+
     def get_fallback_response(self) -> str:
         """Return a fallback response when no FAQ matches"""
         return "I'm sorry, I couldn't find a specific answer to your question. Please contact our support team for assistance."
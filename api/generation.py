@@ -1,13 +1,197 @@
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+import time
+from collections import OrderedDict
 from pathlib import Path
-from jinja2 import Environment, FileSystemLoader, select_autoescape
+from typing import Dict, Iterator, Optional, Tuple
+
+import jinja2
+from jinja2 import Environment, FileSystemLoader, ModuleLoader, select_autoescape
+
+from api.config import settings
+from api.metrics import TEMPLATE_RENDER_SECONDS
+from api.shared_store import ensure_private_dir
 
 PROMPTS_DIR = Path(__file__).parent / "prompts"
 
-_env = Environment(
-    loader=FileSystemLoader(str(PROMPTS_DIR)),
-    autoescape=select_autoescape(disabled_extensions=("md", "j2"))
-)
+def _environment(loader) -> Environment:
+    return Environment(
+        loader=loader,
+        autoescape=select_autoescape(disabled_extensions=("md", "j2"))
+    )
+
+class TemplateStore:
+    """The api/prompts templates, compiled ahead of time, plus an LRU of rendered output.
+
+    load() compiles every template to a Python module and imports them all, so
+    no request pays for parsing. Modules are written once per distinct set of
+    template sources under compiled_dir, where other workers and restarts reuse
+    them. Rendered text is cached by template name and the exact inputs, so a
+    hit returns what a fresh render would. The compiled directory must be
+    owned by the server's user with mode 0700; any other is refused and
+    templates compile in memory instead. Template files are stat'ed at most
+    once per check_interval; any change recompiles and empties the cache, and
+    templates that fail to compile keep the previous set in service.
+    """
+
+    def __init__(self, prompts_dir: Path = PROMPTS_DIR, compiled_dir: str = settings.TEMPLATE_COMPILED_DIR,
+                 cache_size: int = settings.TEMPLATE_CACHE_SIZE,
+                 check_interval: float = settings.TEMPLATE_CHECK_INTERVAL):
+        self.prompts_dir = Path(prompts_dir)
+        self.compiled_dir = compiled_dir
+        self.cache_size = cache_size
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._env: Optional[Environment] = None
+        self._mtimes: Dict[str, int] = {}
+        self._checked_at = 0.0
+        self._rendered: "OrderedDict[tuple, str]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self.module_dir: Optional[str] = None
+        self.loads = 0
+        self.last_error: Optional[str] = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _files(self):
+        return sorted(p for p in self.prompts_dir.rglob("*") if p.is_file())
+
+    def _scan(self) -> Dict[str, int]:
+        return {p.relative_to(self.prompts_dir).as_posix(): p.stat().st_mtime_ns for p in self._files()}
+
+    def env(self) -> Environment:
+        env = self._env
+        if env is not None and time.monotonic() - self._checked_at < self.check_interval:
+            return env
+        with self._lock:
+            if self._env is None or time.monotonic() - self._checked_at >= self.check_interval:
+                self._checked_at = time.monotonic()
+                try:
+                    mtimes = self._scan()
+                    if self._env is None or mtimes != self._mtimes:
+                        self._load(mtimes)
+                except (OSError, jinja2.TemplateError) as e:
+                    self.last_error = f"{type(e).__name__}: {e}"
+                    if self._env is None:
+                        raise
+            return self._env
+
+    def load(self) -> Environment:
+        """(Re)compile and import every template now; called at startup"""
+        with self._lock:
+            self._checked_at = time.monotonic()
+            self._load(self._scan())
+            return self._env
+
+    def _load(self, mtimes: Dict[str, int]) -> None:
+        source_env = _environment(FileSystemLoader(str(self.prompts_dir)))
+        env, warning = source_env, None
+        if self.compiled_dir:
+            try:
+                self.module_dir = self._compile(source_env)
+                env = _environment(ModuleLoader(self.module_dir))
+            except PermissionError as e:
+                # Never import modules from a directory someone else could have written
+                self.module_dir, warning = None, f"compiled in memory: {e}"
+        for name in source_env.list_templates():
+            env.get_template(name)
+        with self._cache_lock:
+            self._env, self._mtimes = env, mtimes
+            self._rendered.clear()
+        self.loads += 1
+        self.last_error = warning
+
+    def _compile(self, source_env: Environment) -> str:
+        """Directory of compiled modules for the current sources, building it if no worker has yet"""
+        digest = hashlib.sha1(jinja2.__version__.encode())
+        for path in self._files():
+            digest.update(path.relative_to(self.prompts_dir).as_posix().encode() + b"\0")
+            digest.update(path.read_bytes())
+        # Checked before an existing set is trusted, not only when we create it
+        ensure_private_dir(self.compiled_dir)
+        target = os.path.join(self.compiled_dir, digest.hexdigest()[:16])
+        if os.path.isdir(target):
+            return target
+        # Build aside and rename into place, so no worker ever imports a half-written set
+        staging = tempfile.mkdtemp(prefix=".build-", dir=self.compiled_dir)
+        try:
+            source_env.compile_templates(staging, zip=None, ignore_errors=False)
+            os.rename(staging, target)
+        except OSError:
+            if not os.path.isdir(target):  # otherwise another worker got there first
+                raise
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+        return target
+
+    def _lookup(self, name: str, kwargs: dict) -> Tuple[tuple, Optional[str]]:
+        key = (name, tuple(sorted(kwargs.items())))
+        with self._cache_lock:
+            text = self._rendered.get(key)
+            if text is not None:
+                self._rendered.move_to_end(key)
+                self.hits += 1
+            else:
+                self.misses += 1
+        return key, text
+
+    def _store(self, env: Environment, key: tuple, text: str) -> None:
+        with self._cache_lock:
+            # Output of a template replaced while we rendered isn't kept
+            if self.cache_size > 0 and env is self._env:
+                self._rendered[key] = text
+                if len(self._rendered) > self.cache_size:
+                    self._rendered.popitem(last=False)
+                    self.evictions += 1
+
+    def render(self, name: str, **kwargs) -> str:
+        env = self.env()
+        key, text = self._lookup(name, kwargs)
+        if text is None:
+            with TEMPLATE_RENDER_SECONDS.time(name):
+                text = env.get_template(name).render(**kwargs)
+            self._store(env, key, text)
+        return text
+
+    def stream(self, name: str, **kwargs) -> Iterator[str]:
+        """render()'s output line by line, as Jinja produces it; shares render()'s cache"""
+        env = self.env()
+        key, text = self._lookup(name, kwargs)
+        if text is not None:
+            yield from text.splitlines(keepends=True)
+            return
+        parts, line = [], []
+        for chunk in env.get_template(name).generate(**kwargs):
+            parts.append(chunk)
+            *complete, rest = chunk.split("\n")
+            for piece in complete:
+                line.append(piece)
+                yield "".join(line) + "\n"
+                line = []
+            if rest:
+                line.append(rest)
+        if line:
+            yield "".join(line)
+        self._store(env, key, "".join(parts))
+
+    def stats(self) -> dict:
+        return {
+            "templates": len(self._mtimes),
+            "module_dir": self.module_dir,
+            "loads": self.loads,
+            "last_error": self.last_error,
+            "cache_size": self.cache_size,
+            "cached": len(self._rendered),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+templates = TemplateStore()
 
 def render_template(name: str, **kwargs) -> str:
-    tmpl = _env.get_template(name)
-    return tmpl.render(**kwargs)
+    return templates.render(name, **kwargs)
@@ -0,0 +1,171 @@
+import json
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Callable, Dict, Optional, Tuple
+
+from api import shared_store
+from api.config import settings
+
+@dataclass
+class Job:
+    """A background job and its progress, as reported by the jobs endpoints"""
+    id: str
+    kind: str
+    params: dict = field(default_factory=dict)
+    state: str = "queued"  # queued | running | succeeded | failed
+    rows_processed: int = 0
+    result: Optional[dict] = None
+    error: Optional[str] = None
+    submitted_at: datetime = field(default_factory=lambda: datetime.now(timezone.utc))
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    _started: Optional[float] = None
+    _finished: Optional[float] = None
+
+    @property
+    def elapsed_seconds(self) -> Optional[float]:
+        if self._started is None:
+            return None
+        return round((self._finished or time.monotonic()) - self._started, 3)
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "params": self.params,
+            "state": self.state,
+            "rows_processed": self.rows_processed,
+            "elapsed_seconds": self.elapsed_seconds,
+            "submitted_at": self.submitted_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "result": self.result,
+            "error": self.error,
+        }
+
+class JobRunner:
+    """Runs jobs on a thread pool and keeps the most recent finished ones for status lookups.
+
+    Jobs sharing an exclusive key never run concurrently: a submit while one
+    is queued or running returns the existing job instead. The key is held as
+    a store lock from submit until the job finishes, so with a shared store
+    this holds across workers too. Each job's status is published to the
+    store when it changes state or reports progress, so a poll that lands on
+    another worker still finds it.
+    """
+
+    def __init__(self, max_workers: int = settings.JOB_WORKERS, history: int = settings.JOB_HISTORY, store=None):
+        self.store = store if store is not None else shared_store.store
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self._history = history
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._active: Dict[str, str] = {}  # exclusive key -> job id
+        self._held: Dict[str, object] = {}  # exclusive key -> store lock, released when the job ends
+        self._lock = threading.Lock()
+
+    def submit(self, kind: str, fn: Callable[[Job], dict], params: Optional[dict] = None,
+               exclusive_key: Optional[str] = None) -> Tuple[Job, bool]:
+        """Queue fn(job); returns (job, created). created is False when coalesced"""
+        if not exclusive_key:
+            job = Job(id=uuid.uuid4().hex, kind=kind, params=params or {})
+            with self._lock:
+                self._add(job)
+            self._publish(job)
+            self._executor.submit(self._run, job, fn, None)
+            return job, True
+
+        # One exclusive submit at a time across workers, so the active marker read below is current
+        with self.store.lock(f"job-submit:{exclusive_key}"), self._lock:
+            if exclusive_key in self._active:
+                return self._jobs[self._active[exclusive_key]], False
+            held = self.store.try_lock(f"job-exclusive:{exclusive_key}")
+            if held is None:
+                return self._running_elsewhere(exclusive_key, kind), False
+            job = Job(id=uuid.uuid4().hex, kind=kind, params=params or {})
+            self._add(job)
+            self._active[exclusive_key] = job.id
+            self._held[exclusive_key] = held
+            self._publish(job)
+            self.store.put(f"job-active:{exclusive_key}", job.id.encode())
+        self._executor.submit(self._run, job, fn, exclusive_key)
+        return job, True
+
+    def _add(self, job: Job) -> None:
+        self._jobs[job.id] = job
+        excess = len(self._jobs) - self._history
+        if excess > 0:
+            # Only finished jobs age out: queued and running ones must stay findable
+            finished = [i for i, j in self._jobs.items() if j.state in ("succeeded", "failed")]
+            for job_id in finished[:excess]:
+                del self._jobs[job_id]
+
+    def _running_elsewhere(self, exclusive_key: str, kind: str) -> Job:
+        """The queued or running job another worker holds exclusive_key for, from its published status"""
+        raw = self.store.get(f"job-active:{exclusive_key}")
+        snapshot = self.status(raw.decode()) if raw is not None else None
+        if snapshot is None:
+            return Job(id=raw.decode() if raw else "", kind=kind, state="running")
+        return Job(id=snapshot["id"], kind=snapshot["kind"], params=snapshot["params"],
+                   state=snapshot["state"], rows_processed=snapshot["rows_processed"])
+
+    def progress(self, job: Job, rows: int) -> None:
+        """Record rows processed so far, where every worker's /jobs/{id} can see it"""
+        job.rows_processed = rows
+        self._publish(job)
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self._jobs.get(job_id)
+
+    def status(self, job_id: str) -> Optional[dict]:
+        """to_dict() of a job run by this worker, else the last status another worker published"""
+        job = self._jobs.get(job_id)
+        if job is not None:
+            return job.to_dict()
+        if self.store.shared:
+            raw = self.store.get(f"job:{job_id}")
+            if raw is not None:
+                return json.loads(raw)
+        return None
+
+    def _publish(self, job: Job) -> None:
+        if self.store.shared:
+            self.store.put(f"job:{job.id}", json.dumps(job.to_dict(), default=_isoformat).encode())
+
+    def shutdown(self) -> None:
+        """Drop queued jobs; a running job finishes in its thread"""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _run(self, job: Job, fn: Callable[[Job], dict], exclusive_key: Optional[str]) -> None:
+        job.state = "running"
+        job.started_at = datetime.now(timezone.utc)
+        job._started = time.monotonic()
+        self._publish(job)
+        try:
+            job.result = fn(job)
+            job.state = "succeeded"
+        except Exception as e:
+            job.error = str(e)
+            job.state = "failed"
+        finally:
+            job._finished = time.monotonic()
+            job.finished_at = datetime.now(timezone.utc)
+            held = None
+            if exclusive_key:
+                with self._lock:
+                    self._active.pop(exclusive_key, None)
+                    held = self._held.pop(exclusive_key, None)
+            self._publish(job)
+            if held is not None:
+                held.release()
+
+def _isoformat(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+job_runner = JobRunner()
@@ -0,0 +1,147 @@
+from datetime import datetime, timedelta, timezone
+from typing import Iterable, Optional
+
+from sqlalchemy import delete, func, select
+from sqlalchemy.orm import Session
+
+from api.models import ConvoRollup, Feedback
+from db.database import begin_immediate, dialect_insert
+from db.models.models import Message
+
+# Messages answered below this confidence count as escalations
+LOW_CONFIDENCE_THRESHOLD = 30.0
+
+WINDOWS = {
+    "24h": timedelta(hours=24),
+    "7d": timedelta(days=7),
+    "30d": timedelta(days=30),
+    "all": None,
+}
+
+_COUNTERS = ["message_count", "low_confidence_count", "confidence_sum",
+             "confidence_count", "feedback_total", "feedback_helpful"]
+
+def _hour(at: Optional[datetime] = None) -> datetime:
+    return (at or datetime.utcnow()).replace(minute=0, second=0, microsecond=0)
+
+def _increment(db: Session, bucket_start: datetime, **deltas) -> None:
+    """Add deltas to one hourly bucket (INSERT ... ON CONFLICT DO UPDATE SET x = x + delta)"""
+    table = ConvoRollup.__table__
+    values = {c: deltas.get(c, 0) for c in _COUNTERS}
+    stmt = dialect_insert(db, table).values(bucket_start=bucket_start, **values)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["bucket_start"],
+        set_={c: table.c[c] + stmt.excluded[c] for c in _COUNTERS if deltas.get(c)},
+    )
+    db.execute(stmt)
+
+def record_messages(db: Session, confidences: Iterable[Optional[float]], at: Optional[datetime] = None) -> None:
+    """Count newly written messages in the rollup; call in the same transaction as the insert"""
+    scored = [c for c in confidences]
+    known = [c for c in scored if c is not None]
+    _increment(
+        db, _hour(at),
+        message_count=len(scored),
+        low_confidence_count=sum(1 for c in known if c < LOW_CONFIDENCE_THRESHOLD),
+        confidence_sum=float(sum(known)),
+        confidence_count=len(known),
+    )
+
+def record_feedback(db: Session, helpful: bool, at: Optional[datetime] = None) -> None:
+    _increment(db, _hour(at), feedback_total=1, feedback_helpful=int(bool(helpful)))
+
+def _utc_expr(db: Session, column):
+    """column as naive UTC, like bucket_start (timestamptz on Postgres is otherwise aware, in the session zone)"""
+    if db.get_bind().dialect.name == "postgresql" and getattr(column.type, "timezone", False):
+        return func.timezone("UTC", column)
+    return column
+
+def _hour_expr(db: Session, column):
+    if db.get_bind().dialect.name == "postgresql":
+        return func.date_trunc("hour", _utc_expr(db, column))
+    return func.strftime("%Y-%m-%d %H:00:00", column)
+
+def _bucket_key(bucket) -> datetime:
+    """A bucket from _hour_expr as a naive UTC datetime, so message and feedback hours share one key"""
+    if isinstance(bucket, str):
+        bucket = datetime.fromisoformat(bucket)
+    if bucket.tzinfo is not None:
+        bucket = bucket.astimezone(timezone.utc).replace(tzinfo=None)
+    return bucket
+
+def rebuild_convo_rollup(db: Session, since: Optional[datetime] = None) -> int:
+    """Recompute hourly buckets from messages and feedback (all history, or from `since`).
+
+    Used to backfill the rollup and to pick up rows written outside the API.
+    Returns the number of buckets written.
+    """
+    # Read and rewrite under the write lock, so concurrently logged rows aren't lost or double-counted
+    begin_immediate(db)
+    cutoff = _hour(since) if since else None
+    buckets: dict = {}
+
+    hour = _hour_expr(db, Message.timestamp)
+    q = select(
+        hour,
+        func.count(),
+        func.count().filter(Message.confidence_score < LOW_CONFIDENCE_THRESHOLD),
+        func.coalesce(func.sum(Message.confidence_score), 0.0),
+        func.count(Message.confidence_score),
+    ).group_by(hour)
+    if cutoff:
+        q = q.where(Message.timestamp >= cutoff)
+    for bucket, total, low, conf_sum, conf_count in db.execute(q):
+        if bucket is None:
+            continue
+        buckets.setdefault(_bucket_key(bucket), dict.fromkeys(_COUNTERS, 0)).update(
+            message_count=total, low_confidence_count=low,
+            confidence_sum=float(conf_sum), confidence_count=conf_count,
+        )
+
+    hour = _hour_expr(db, Feedback.created_at)
+    q = select(hour, func.count(), func.count().filter(Feedback.helpful.is_(True))).group_by(hour)
+    if cutoff:
+        q = q.where(_utc_expr(db, Feedback.created_at) >= cutoff)
+    for bucket, total, helpful in db.execute(q):
+        if bucket is None:
+            continue
+        buckets.setdefault(_bucket_key(bucket), dict.fromkeys(_COUNTERS, 0)).update(
+            feedback_total=total, feedback_helpful=helpful,
+        )
+
+    clear = delete(ConvoRollup)
+    if cutoff:
+        clear = clear.where(ConvoRollup.bucket_start >= cutoff)
+    db.execute(clear)
+    rows = [{"bucket_start": b, **counts} for b, counts in buckets.items()]
+    if rows:
+        db.execute(ConvoRollup.__table__.insert(), rows)
+    db.commit()
+    return len(rows)
+
+def ensure_convo_rollup(db: Session) -> None:
+    """Backfill the rollup once, e.g. for a database that predates it"""
+    empty = db.execute(select(ConvoRollup.bucket_start).limit(1)).first() is None
+    if empty and db.execute(select(Message.id).limit(1)).first() is not None:
+        rebuild_convo_rollup(db)
+
+def convo_kpis(db: Session, window: str = "all") -> dict:
+    # total, escalation_rate (< threshold), avg_confidence, helpful_rate
+    # Reads the hourly rollup, so cost depends on the window, not on history size
+    if window not in WINDOWS:
+        raise ValueError(f"Unknown window {window!r}; expected one of {list(WINDOWS)}")
+    q = select(*(func.coalesce(func.sum(getattr(ConvoRollup, c)), 0) for c in _COUNTERS))
+    if WINDOWS[window] is not None:
+        q = q.where(ConvoRollup.bucket_start >= _hour(datetime.utcnow() - WINDOWS[window]))
+    total, low, conf_sum, conf_count, fb_total, fb_help = db.execute(q).one()
+
+    avg_conf = (conf_sum / conf_count) if conf_count else 0.0
+    helpful_rate = (fb_help / fb_total) if fb_total else None
+
+    return {
+        "window": window,
+        "total": int(total),
+        "escalation_rate": round((low / total), 4) if total else 0.0,
+        "avg_confidence": round(float(avg_conf), 4) if avg_conf else 0.0,
+        "helpful_rate": round(float(helpful_rate), 4) if helpful_rate is not None else None
+    }
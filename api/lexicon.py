@@ -0,0 +1,132 @@
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+import ahocorasick
+
+from api.config import settings
+
+@dataclass
+class Signals:
+    sentiment: float
+    topic: str
+    is_misinfo: bool
+
+class Lexicon:
+    """Every sentiment, topic and misinformation term compiled into one Aho-Corasick automaton.
+
+    Terms match as plain substrings of the lowercased text, like the original
+    `in` checks, overlaps included ("fake news" also counts "fake"). One pass
+    over the text finds all of them, however many terms the lexicon has.
+    """
+
+    def __init__(self, config: dict):
+        sentiment = config.get("sentiment", {})
+        self.scale = float(sentiment.get("scale", 3.0))
+        self.default_topic = config.get("default_topic", "general")
+        self.topic_order = [t["name"] for t in config.get("topics", [])]
+
+        # term -> (sentiment delta, topic rank, is misinformation); ranks follow the
+        # topic order in the config, and the lowest-ranked topic present wins
+        no_topic = len(self.topic_order)
+        terms: Dict[str, list] = {}
+        def entry(term: str) -> list:
+            return terms.setdefault(term.lower(), [0, no_topic, False])
+        for term in sentiment.get("positive", []):
+            entry(term)[0] += 1
+        for term in sentiment.get("negative", []):
+            entry(term)[0] -= 1
+        for rank, topic in enumerate(config.get("topics", [])):
+            for term in topic["terms"]:
+                e = entry(term)
+                e[1] = min(e[1], rank)
+        for term in config.get("misinfo", []):
+            entry(term)[2] = True
+        terms.pop("", None)
+
+        self._automaton = ahocorasick.Automaton()
+        self._signals = []
+        for i, (term, signal) in enumerate(terms.items()):
+            self._automaton.add_word(term, i)
+            self._signals.append(tuple(signal))
+        if terms:
+            self._automaton.make_automaton()
+        self.terms = len(terms)
+
+    def scan(self, text: str) -> Signals:
+        if not text or not self.terms:
+            return Signals(0.0, self.default_topic, False)
+        # Distinct terms present, each counted once like the original `in` checks
+        hits = {i for _, i in self._automaton.iter(text.lower())}
+        score, rank, misinfo = 0, len(self.topic_order), False
+        for i in hits:
+            delta, topic_rank, is_misinfo = self._signals[i]
+            score += delta
+            rank = min(rank, topic_rank)
+            misinfo = misinfo or is_misinfo
+        return Signals(
+            sentiment=max(-1.0, min(1.0, score / self.scale)),
+            topic=self.topic_order[rank] if rank < len(self.topic_order) else self.default_topic,
+            is_misinfo=misinfo,
+        )
+
+class LexiconStore:
+    """The compiled lexicon for LEXICON_PATH, recompiled when the file's mtime changes.
+
+    The file is stat'ed at most once per check_interval seconds. A file that
+    fails to load keeps the previous lexicon in service.
+    """
+
+    def __init__(self, path: str = settings.LEXICON_PATH, check_interval: float = settings.LEXICON_CHECK_INTERVAL):
+        self.path = path
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._lexicon: Optional[Lexicon] = None
+        self._mtime: Optional[float] = None
+        self._checked_at = 0.0
+        self.loads = 0
+        self.last_error: Optional[str] = None
+
+    def get(self) -> Lexicon:
+        lexicon = self._lexicon
+        if lexicon is not None and time.monotonic() - self._checked_at < self.check_interval:
+            return lexicon
+        with self._lock:
+            if self._lexicon is None or time.monotonic() - self._checked_at >= self.check_interval:
+                self._checked_at = time.monotonic()
+                try:
+                    mtime = os.stat(self.path).st_mtime
+                    if self._lexicon is None or mtime != self._mtime:
+                        self._load(mtime)
+                except (OSError, ValueError, KeyError, TypeError) as e:
+                    self.last_error = f"{type(e).__name__}: {e}"
+                    if self._lexicon is None:
+                        raise
+            return self._lexicon
+
+    def reload(self) -> Lexicon:
+        with self._lock:
+            self._checked_at = time.monotonic()
+            self._load(os.stat(self.path).st_mtime)
+            return self._lexicon
+
+    def _load(self, mtime: float) -> None:
+        with open(self.path, encoding="utf-8") as f:
+            lexicon = Lexicon(json.load(f))
+        self._lexicon, self._mtime = lexicon, mtime
+        self.loads += 1
+        self.last_error = None
+
+    def stats(self) -> dict:
+        return {
+            "path": self.path,
+            "terms": self._lexicon.terms if self._lexicon else None,
+            "mtime": self._mtime,
+            "loads": self.loads,
+            "last_error": self.last_error,
+        }
+
+lexicons = LexiconStore()
@@ -1,16 +1,78 @@
-from fastapi import FastAPI
-from fastapi.middleware.cors import CORSMiddleware
-from api.routers.chat import router as chat_router
-from api.routers.feedback import router as feedback_router
-from api.routers.generate import router as generate_router
-from api.routers.analytics import router as analytics_router
-from api.routers.reputation import router as reputation_router
-from api.config import settings
+from api.startup import startup_report  # first, so the boot clock covers every import below
+
+import importlib
+from contextlib import asynccontextmanager
+
+with startup_report.step("fastapi"):
+    from fastapi import FastAPI
+    from fastapi.middleware.cors import CORSMiddleware
+
+with startup_report.step("core"):
+    import api.models, db.models.models  # noqa: F401 - register every table for create_tables()
+    from api.config import settings
+    from api.jobs import job_runner
+    from api.message_log import message_log
+    from api.metrics import MetricsMiddleware
+    from api.kpis import ensure_convo_rollup
+    from db.database import create_tables, SessionLocal, async_engine
+
+# name -> (module, URL prefix); ENABLED_ROUTERS picks which ones this worker imports and serves
+ROUTERS = {
+    "chat": ("api.routers.chat", "/api/v1"),
+    "feedback": ("api.routers.feedback", "/api/v1"),
+    "generate": ("api.routers.generate", "/api/v1"),
+    "analytics": ("api.routers.analytics", "/api/v1"),
+    "reputation": ("api.routers.reputation", "/api/v1"),
+    "admin": ("api.routers.admin", "/api/v1"),
+    "metrics": ("api.routers.metrics", ""),
+}
+
+def enabled_routers(value: str = settings.ENABLED_ROUTERS) -> list[str]:
+    names = {n.strip().lower() for n in value.split(",") if n.strip()}
+    if not names or "all" in names:
+        return list(ROUTERS)
+    unknown = names - set(ROUTERS)
+    if unknown:
+        raise ValueError(f"ENABLED_ROUTERS: unknown router(s) {sorted(unknown)}; choose from {', '.join(ROUTERS)}")
+    return [name for name in ROUTERS if name in names]
+
+ENABLED = enabled_routers()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if not settings.SCHEMA_READY:  # otherwise the gunicorn master already did both
+        # Creates missing tables and (re)installs the faqs change-tracking triggers
+        with startup_report.step("create_tables"):
+            create_tables()
+        db = SessionLocal()
+        try:
+            # Backfill the KPI rollup for databases that predate it
+            with startup_report.step("convo_rollup"):
+                ensure_convo_rollup(db)
+        finally:
+            db.close()
+    if "generate" in ENABLED:
+        # Compile and import the generation templates before the first request
+        from api.generation import templates
+        with startup_report.step("templates"):
+            templates.load()
+    message_log.start()
+    startup_report.ready()
+    print(startup_report.summary())
+    yield
+    # Drain queued chat messages before the process exits
+    message_log.stop()
+    job_runner.shutdown()
+    if "reputation" in ENABLED:
+        from api.reputation import shutdown_analysis_pool
+        shutdown_analysis_pool()
+    await async_engine.dispose()
 
 app = FastAPI(
     title="Customer AI Chat System",
     description="A simple FAQ-based customer support chatbot",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Add CORS middleware
@@ -22,12 +84,18 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Request latency histograms for /metrics
+app.add_middleware(MetricsMiddleware)
+
 # Include routers
-app.include_router(chat_router, prefix="/api/v1", tags=["chat"])
-app.include_router(feedback_router, prefix="/api/v1", tags=["feedback"])
-app.include_router(generate_router, prefix="/api/v1", tags=["generate"])
-app.include_router(analytics_router, prefix="/api/v1", tags=["analytics"])
-app.include_router(reputation_router, prefix="/api/v1", tags=["reputation"])
+for name in ENABLED:
+    module, prefix = ROUTERS[name]
+    with startup_report.step(f"router:{name}"):
+        router = importlib.import_module(module).router
+    if prefix:
+        app.include_router(router, prefix=prefix, tags=[name])
+    else:
+        app.include_router(router)
 
 @app.get("/")
 async def root():
@@ -37,6 +105,11 @@ async def root():
 async def health_check():
     return {"status": "healthy"}
 
+@app.get("/startup")
+async def startup_status():
+    """Where this worker's boot time went: per-step seconds and the packages each step imported"""
+    return {"routers": ENABLED, **startup_report.to_dict()}
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -0,0 +1,259 @@
+import json
+import logging
+import queue
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from sqlalchemy import insert, text
+
+from api.config import settings
+from api.kpis import record_messages
+from api.metrics import MESSAGE_FLUSH_SECONDS
+from db.database import SessionLocal, engine
+from db.models.models import Message
+
+logger = logging.getLogger(__name__)
+
+class MessageLogFull(Exception):
+    """The write-behind queue stayed full for MESSAGE_QUEUE_TIMEOUT seconds"""
+
+class IdAllocator:
+    """Hands out messages.id values ahead of the INSERT.
+
+    Postgres draws a block from the table's own serial sequence. SQLite has no
+    sequences, so blocks come from the id_blocks row (hi-lo), which never falls
+    behind MAX(messages.id), so a new block never reuses a written id. The
+    reverse isn't guarded on SQLite: a row inserted without the allocator takes
+    MAX(id) + 1, which may be an id handed out but not yet flushed. That queued
+    row then fails and is dead-lettered, so with write-behind on, write
+    messages through the log.
+    """
+
+    def __init__(self, table: str = "messages", block_size: int = settings.MESSAGE_ID_BLOCK):
+        self.table = table
+        self.block_size = block_size
+        self._ids: deque = deque()
+        self._lock = threading.Lock()
+
+    def allocate(self, n: int = 1) -> List[int]:
+        with self._lock:
+            while len(self._ids) < n:
+                self._ids.extend(self._next_block(max(self.block_size, n - len(self._ids))))
+            return [self._ids.popleft() for _ in range(n)]
+
+    def _next_block(self, size: int) -> List[int]:
+        with engine.begin() as conn:
+            if conn.dialect.name == "postgresql":
+                rows = conn.execute(
+                    text("SELECT nextval(pg_get_serial_sequence(:t, 'id')) FROM generate_series(1, :n)"),
+                    {"t": self.table, "n": size}
+                )
+                return [r[0] for r in rows]
+            conn.execute(text("INSERT OR IGNORE INTO id_blocks (name, next_id) VALUES (:t, 1)"), {"t": self.table})
+            hi = conn.execute(
+                text(
+                    f"UPDATE id_blocks SET next_id = MAX(next_id, (SELECT COALESCE(MAX(id), 0) + 1 FROM {self.table})) + :n "
+                    "WHERE name = :t RETURNING next_id"
+                ),
+                {"t": self.table, "n": size}
+            ).scalar_one()
+            return list(range(hi - size, hi))
+
+    def issued(self, message_id: int) -> bool:
+        """Whether any worker's allocator has handed out message_id (its row may still be queued there)"""
+        with engine.connect() as conn:
+            if conn.dialect.name == "postgresql":
+                last = conn.execute(
+                    text("SELECT last_value FROM pg_sequences "
+                         "WHERE format('%I.%I', schemaname, sequencename) = pg_get_serial_sequence(:t, 'id')"),
+                    {"t": self.table}
+                ).scalar()
+            else:
+                next_id = conn.execute(
+                    text("SELECT next_id FROM id_blocks WHERE name = :t"), {"t": self.table}
+                ).scalar()
+                last = next_id - 1 if next_id is not None else None
+        return last is not None and message_id <= last
+
+class MessageLog:
+    """Write-behind buffer for chat messages.
+
+    log() assigns ids from the allocator and queues the rows; a writer thread
+    inserts them (and their KPI rollup counts) in one transaction per batch of
+    MESSAGE_FLUSH_BATCH rows or every MESSAGE_FLUSH_INTERVAL seconds. The queue
+    is bounded: when the database falls behind, log() blocks and eventually
+    raises MessageLogFull. Queued rows stay visible through pending() until
+    their batch commits, and stop() drains the queue before returning. A
+    batch that keeps failing is retried MESSAGE_FLUSH_RETRIES times, then
+    written row by row, with rows that still fail dead-lettered to a file.
+
+    pending() only sees this worker's queue. Under several workers, callers
+    that look a message up by id use ids.issued() to tell an id queued in
+    another worker from one that never existed, and wait for it to land.
+    """
+
+    def __init__(self, enabled: bool = settings.MESSAGE_WRITE_BEHIND,
+                 batch_size: int = settings.MESSAGE_FLUSH_BATCH,
+                 flush_interval: float = settings.MESSAGE_FLUSH_INTERVAL,
+                 max_queued: int = settings.MESSAGE_QUEUE_MAX,
+                 put_timeout: float = settings.MESSAGE_QUEUE_TIMEOUT,
+                 max_retries: int = settings.MESSAGE_FLUSH_RETRIES,
+                 dead_letter_path: str = settings.MESSAGE_DEAD_LETTER_PATH):
+        self.enabled = enabled
+        self.max_retries = max(max_retries, 1)
+        self.dead_letter_path = dead_letter_path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.put_timeout = put_timeout
+        self.ids = IdAllocator()
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queued)
+        self._pending: Dict[int, dict] = {}
+        self._pending_lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.flushed = 0
+        self.batches = 0
+        self.failures = 0
+        self.dead_lettered = 0
+        self.last_flush_ms = 0.0
+
+    def start(self) -> None:
+        if self.enabled and self._thread is None:
+            self._stopping.clear()
+            self._thread = threading.Thread(target=self._run, name="message-log", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = 30.0) -> None:
+        """Flush everything queued, then stop the writer"""
+        if self._thread is not None:
+            self._stopping.set()
+            self._thread.join(timeout)
+            self._thread = None
+
+    def log(self, rows: List[dict]) -> List[int]:
+        """Queue messages rows (without id); returns their ids in order. Blocking: call off the event loop"""
+        ids = self.ids.allocate(len(rows))
+        now = datetime.utcnow()
+        rows = [{**row, "id": message_id, "timestamp": now} for row, message_id in zip(rows, ids)]
+        with self._pending_lock:
+            for row in rows:
+                self._pending[row["id"]] = row
+        deadline = time.monotonic() + self.put_timeout
+        for i, row in enumerate(rows):
+            try:
+                self._queue.put(row, timeout=max(deadline - time.monotonic(), 0.001))
+            except queue.Full:
+                # Rows already queued will still be written; the rest are dropped
+                with self._pending_lock:
+                    for dropped in rows[i:]:
+                        self._pending.pop(dropped["id"], None)
+                raise MessageLogFull(f"message queue full ({self._queue.maxsize} rows)")
+        return ids
+
+    def pending(self, message_id: int) -> Optional[dict]:
+        """The queued row for message_id, if it hasn't been committed yet"""
+        return self._pending.get(message_id)
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "queued": self._queue.qsize(),
+            "pending": len(self._pending),
+            "flushed": self.flushed,
+            "batches": self.batches,
+            "failures": self.failures,
+            "dead_lettered": self.dead_lettered,
+            "last_flush_ms": round(self.last_flush_ms, 3),
+        }
+
+    def _run(self) -> None:
+        while True:
+            batch = self._take_batch()
+            if batch:
+                self._flush(batch)
+            elif self._stopping.is_set():
+                return
+
+    def _take_batch(self) -> List[dict]:
+        try:
+            batch = [self._queue.get(timeout=self.flush_interval)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get(timeout=max(deadline - time.monotonic(), 0)))
+            except queue.Empty:
+                break
+        return batch
+
+    def _flush(self, batch: List[dict]) -> None:
+        # Retry, since the rows are already acknowledged to clients, but not forever: a batch
+        # that can never commit would block every later one and fill the queue. While
+        # stopping, give up sooner rather than hang shutdown.
+        attempt = dead = 0
+        start = time.perf_counter()
+        while True:
+            try:
+                self._write(batch)
+                break
+            except Exception as e:
+                self.failures += 1
+                attempt += 1
+                logger.warning("message log flush failed (%d rows, attempt %d): %s", len(batch), attempt, e)
+                if attempt >= (min(3, self.max_retries) if self._stopping.is_set() else self.max_retries):
+                    dead = self._salvage(batch)
+                    break
+                time.sleep(min(0.1 * 2 ** attempt, 5.0))
+                start = time.perf_counter()
+
+        with self._pending_lock:
+            for row in batch:
+                self._pending.pop(row["id"], None)
+        self.flushed += len(batch) - dead
+        self.batches += 1
+        elapsed = time.perf_counter() - start
+        self.last_flush_ms = elapsed * 1000
+        MESSAGE_FLUSH_SECONDS.observe(elapsed)
+
+    def _write(self, rows: List[dict]) -> None:
+        db = SessionLocal()
+        try:
+            db.execute(insert(Message), rows)
+            by_hour: Dict[datetime, list] = {}
+            for row in rows:
+                hour = row["timestamp"].replace(minute=0, second=0, microsecond=0)
+                by_hour.setdefault(hour, []).append(row["confidence_score"])
+            for at, confidences in by_hour.items():
+                record_messages(db, confidences, at=at)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def _salvage(self, batch: List[dict]) -> int:
+        """Write a failing batch one row at a time; dead-letter the rows that fail on their own and count them"""
+        dead = []
+        for row in batch:
+            try:
+                self._write([row])
+            except Exception as e:
+                dead.append({**row, "timestamp": row["timestamp"].isoformat(), "error": str(e)})
+        if not dead:
+            return 0
+        self.dead_lettered += len(dead)
+        try:
+            with open(self.dead_letter_path, "a", encoding="utf-8") as f:
+                for row in dead:
+                    f.write(json.dumps(row) + "\n")
+            logger.error("message log: %d rows written to %s", len(dead), self.dead_letter_path)
+        except OSError as e:
+            logger.error("message log: dropped %d rows, dead-letter file unwritable: %s", len(dead), e)
+        return len(dead)
+
+message_log = MessageLog()
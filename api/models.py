@@ -1,6 +1,6 @@
-from sqlalchemy import Column, Integer, String, Text, Boolean, DateTime, JSON, Float, TIMESTAMP
+from sqlalchemy import Column, Integer, BigInteger, String, Text, Boolean, DateTime, JSON, Float, TIMESTAMP, DDL, event
 from sqlalchemy.sql import func
-from db.database import Base
+from db.database import Base, add_missing_columns
 import json
 
 class FAQ(Base):
@@ -20,6 +20,62 @@ class FAQ(Base):
     def keywords_list(self, value):
         self.keywords = json.dumps(value)
 
+class FAQChange(Base):
+    """Change feed for the faqs table; the highest id is the catalog generation"""
+    __tablename__ = "faq_changes"
+
+    id = Column(Integer, primary_key=True)
+    faq_id = Column(Integer, nullable=True)  # NULL means "reload everything" (e.g. TRUNCATE)
+    changed_at = Column(DateTime(timezone=True), server_default=func.now())
+
+# Triggers feed faq_changes, so edits from setup scripts or direct SQL reach running workers too.
+# Attached to the metadata so every create_all() (re)installs them once both tables exist.
+_FAQ_CHANGE_TRIGGERS = [
+    DDL("""
+        CREATE TRIGGER IF NOT EXISTS faqs_track_insert AFTER INSERT ON faqs
+        BEGIN INSERT INTO faq_changes (faq_id) VALUES (NEW.id); END
+    """).execute_if(dialect="sqlite"),
+    DDL("""
+        CREATE TRIGGER IF NOT EXISTS faqs_track_update AFTER UPDATE ON faqs
+        BEGIN
+            INSERT INTO faq_changes (faq_id) SELECT OLD.id WHERE OLD.id <> NEW.id;
+            INSERT INTO faq_changes (faq_id) VALUES (NEW.id);
+        END
+    """).execute_if(dialect="sqlite"),
+    DDL("""
+        CREATE TRIGGER IF NOT EXISTS faqs_track_delete AFTER DELETE ON faqs
+        BEGIN INSERT INTO faq_changes (faq_id) VALUES (OLD.id); END
+    """).execute_if(dialect="sqlite"),
+    DDL("""
+        CREATE OR REPLACE FUNCTION faqs_track_change() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP = 'TRUNCATE' THEN
+                INSERT INTO faq_changes (faq_id) VALUES (NULL);
+                RETURN NULL;
+            END IF;
+            IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                INSERT INTO faq_changes (faq_id) VALUES (OLD.id);
+            END IF;
+            IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                INSERT INTO faq_changes (faq_id) VALUES (NEW.id);
+            END IF;
+            RETURN NULL;
+        END $$ LANGUAGE plpgsql
+    """).execute_if(dialect="postgresql"),
+    DDL("DROP TRIGGER IF EXISTS faqs_track_change ON faqs").execute_if(dialect="postgresql"),
+    DDL("""
+        CREATE TRIGGER faqs_track_change AFTER INSERT OR UPDATE OR DELETE ON faqs
+        FOR EACH ROW EXECUTE FUNCTION faqs_track_change()
+    """).execute_if(dialect="postgresql"),
+    DDL("DROP TRIGGER IF EXISTS faqs_track_truncate ON faqs").execute_if(dialect="postgresql"),
+    DDL("""
+        CREATE TRIGGER faqs_track_truncate AFTER TRUNCATE ON faqs
+        FOR EACH STATEMENT EXECUTE FUNCTION faqs_track_change()
+    """).execute_if(dialect="postgresql"),
+]
+for _ddl in _FAQ_CHANGE_TRIGGERS:
+    event.listen(Base.metadata, "after_create", _ddl)
+
 class Feedback(Base):
     __tablename__ = "feedback"
 
@@ -35,7 +91,18 @@ class ContentLog(Base):
     id = Column(Integer, primary_key=True, index=True)
     type = Column(String, index=True)  # 'post' | 'speech' | 'slogan'
     inputs = Column(JSON)
+    # Rows written before content_blobs existed hold the text here; newer rows leave it
+    # empty and point at the shared blob through output_hash
     output = Column(Text, nullable=False)
+    output_hash = Column(String(64), nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+class ContentBlob(Base):
+    """Generated text stored once per distinct content, keyed by its SHA-256"""
+    __tablename__ = "content_blobs"
+
+    hash = Column(String(64), primary_key=True)
+    text = Column(Text, nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
 class CustomerScore(Base):
@@ -50,6 +117,34 @@ class CustomerScore(Base):
     segment = Column(String, index=True)
     updated_at = Column(DateTime(timezone=True), server_default=func.now())
 
+class CustomerFingerprint(Base):
+    """Hash of each customer's RFM inputs, used to skip unchanged rows in incremental runs"""
+    __tablename__ = "customer_fingerprints"
+
+    user_id = Column(String, primary_key=True)
+    fingerprint = Column(BigInteger, nullable=False)
+    # Earliest time the recency/tenure buckets could move by date alone; NULL = never
+    rescore_after = Column(DateTime, nullable=True)
+
+class ConvoRollup(Base):
+    """Per-hour conversation KPIs, maintained on write (see api.kpis)"""
+    __tablename__ = "convo_rollup_hourly"
+
+    bucket_start = Column(DateTime, primary_key=True)  # UTC, truncated to the hour
+    message_count = Column(Integer, nullable=False, default=0)
+    low_confidence_count = Column(Integer, nullable=False, default=0)
+    confidence_sum = Column(Float, nullable=False, default=0.0)
+    confidence_count = Column(Integer, nullable=False, default=0)
+    feedback_total = Column(Integer, nullable=False, default=0)
+    feedback_helpful = Column(Integer, nullable=False, default=0)
+
+class IdBlock(Base):
+    """Hi-lo id allocator state: next unallocated id per table (SQLite; Postgres uses sequences)"""
+    __tablename__ = "id_blocks"
+
+    name = Column(String, primary_key=True)
+    next_id = Column(BigInteger, nullable=False)
+
 from typing import Optional
 from sqlalchemy.orm import Mapped, mapped_column
 
@@ -57,7 +152,7 @@ class Mention(Base):
     __tablename__ = "mentions"
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     source: Mapped[Optional[str]] = mapped_column(String, nullable=True)
-    url: Mapped[Optional[str]] = mapped_column(String, nullable=True)
+    url: Mapped[Optional[str]] = mapped_column(String, nullable=True, index=True)
     title: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
     text: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
     sentiment: Mapped[float] = mapped_column(Float)
@@ -65,3 +160,21 @@ class Mention(Base):
     is_misinfo: Mapped[bool] = mapped_column(default=False)
     suggestion: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
     created_at: Mapped[str] = mapped_column(DateTime(timezone=True), server_default=func.now())
+
+# Bulk ingestion dedupes by URL; create_all() only indexes new tables, so add it to existing ones too
+event.listen(Base.metadata, "after_create", DDL("CREATE INDEX IF NOT EXISTS ix_mentions_url ON mentions (url)"))
+# /reputation/summary pages newest first
+event.listen(Base.metadata, "after_create", DDL(
+    "CREATE INDEX IF NOT EXISTS ix_mentions_created_at_id ON mentions (created_at, id)"
+))
+# Partial index holding only the rows recent_negative_mentions() wants; its WHERE
+# must match the query's word for word for SQLite to use it
+NEGATIVE_MENTION = "sentiment <= -0.6 OR is_misinfo = TRUE"
+event.listen(Base.metadata, "after_create", DDL(
+    f"CREATE INDEX IF NOT EXISTS ix_mentions_negative_created_at ON mentions (created_at, id) WHERE {NEGATIVE_MENTION}"
+))
+
+add_missing_columns(ContentLog.__table__, "output_hash")
+event.listen(Base.metadata, "after_create", DDL(
+    "CREATE INDEX IF NOT EXISTS ix_content_log_output_hash ON content_log (output_hash)"
+))
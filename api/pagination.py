@@ -0,0 +1,49 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+from typing import Optional, Sequence, Tuple
+
+from sqlalchemy import Select, String, literal, tuple_, type_coerce
+
+class InvalidCursor(ValueError):
+    """A page cursor that wasn't produced by encode_cursor()"""
+
+def encode_cursor(sort_value, row_id: int) -> str:
+    """Opaque cursor for the row at (sort_value, row_id)"""
+    raw = sort_value.isoformat(sep=" ") if isinstance(sort_value, datetime) else str(sort_value)
+    return base64.urlsafe_b64encode(json.dumps([raw, row_id]).encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[str, int]:
+    try:
+        raw, row_id = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (ValueError, TypeError, binascii.Error):
+        raise InvalidCursor("malformed cursor")
+    if not isinstance(raw, str) or not isinstance(row_id, int):
+        raise InvalidCursor("malformed cursor")
+    return raw, row_id
+
+def newest_first(stmt: Select, sort_col, id_col, after: Optional[Tuple[str, int]], limit: int,
+                 dialect: str) -> Select:
+    """Keyset page of stmt ordered by (sort_col, id_col) descending, starting after the cursor position.
+
+    Every page is an index range scan on (sort_col, id_col), however deep.
+    One extra row is fetched to tell whether there is a next page; pass the
+    result rows to split_page().
+    """
+    # SQLite stores timestamps as text in more than one format (server defaults have no
+    # fraction), so cursors carry and compare the stored text rather than a parsed datetime
+    stmt = stmt.add_columns(type_coerce(sort_col, String).label("_sort_key"), id_col.label("_sort_id"))
+    if after is not None:
+        raw, row_id = after
+        bound = literal(raw, String) if dialect == "sqlite" else literal(datetime.fromisoformat(raw), sort_col.type)
+        # Row-value comparison, which both SQLite and Postgres turn into a range on the index
+        stmt = stmt.where(tuple_(sort_col, id_col) < tuple_(bound, row_id))
+    return stmt.order_by(sort_col.desc(), id_col.desc()).limit(limit + 1)
+
+def split_page(rows: Sequence, limit: int) -> Tuple[Sequence, Optional[str]]:
+    """(rows on this page, cursor for the next page or None) from a newest_first() result"""
+    if len(rows) <= limit:
+        return rows, None
+    last = rows[limit - 1]
+    return rows[:limit], encode_cursor(last._sort_key, last._sort_id)
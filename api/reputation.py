@@ -1,34 +1,30 @@
-import re
+import json
+import multiprocessing as mp
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple
+
+from sqlalchemy import insert, select
 from sqlalchemy.orm import Session
+from api.config import settings
+from api.lexicon import Signals, lexicons
 from api.models import Mention
+from api.response_cache import response_cache
+
+# Word lists live in api/lexicons.json (LEXICON_PATH); edits are picked up without a restart
+
+def analyze_text(text: str) -> Signals:
+    """Sentiment, topic and misinformation flag from a single scan of text"""
+    return lexicons.get().scan(text or "")
 
 def simple_sentiment(text: str) -> float:
-    if not text:
-        return 0.0
-    text_l = text.lower()
-    negatives = ["fraud","scam","fake","bad","angry","delay","poor","hate","cheat","complaint"]
-    positives = ["great","good","happy","fast","love","excellent","smooth","trust","reliable"]
-    score = 0
-    for w in positives:
-        if w in text_l: score += 1
-    for w in negatives:
-        if w in text_l: score -= 1
-    return max(-1.0, min(1.0, score/3.0))
+    return analyze_text(text).sentiment
 
 def simple_topic(text: str) -> str:
-    if not text: return "general"
-    t = text.lower()
-    if "delivery" in t: return "delivery"
-    if "price" in t or "cost" in t: return "pricing"
-    if "support" in t or "service" in t: return "support"
-    if "return" in t or "refund" in t: return "returns"
-    return "general"
+    return analyze_text(text).topic
 
 def detect_misinfo(text: str) -> bool:
-    if not text: return False
-    t = text.lower()
-    # crude check: if uncertain claim words exist
-    return any(kw in t for kw in ["rumor","fake news","unverified","hoax"])
+    return analyze_text(text).is_misinfo
 
 def make_suggestion(topic: str, sentiment: float, is_misinfo: bool) -> str:
     if is_misinfo:
@@ -40,9 +36,8 @@ def make_suggestion(topic: str, sentiment: float, is_misinfo: bool) -> str:
     return f"Acknowledge the comment about {topic} and provide helpful context."
 
 def analyze_and_store(db: Session, source: str | None, url: str | None, title: str, text: str) -> Mention:
-    s = simple_sentiment(text or title or "")
-    t = simple_topic(text or title or "")
-    misinfo = detect_misinfo(text or title or "")
+    signals = analyze_text(text or title or "")
+    s, t, misinfo = signals.sentiment, signals.topic, signals.is_misinfo
     sugg = make_suggestion(t, s, misinfo)
 
     m = Mention(
@@ -57,4 +52,162 @@ def analyze_and_store(db: Session, source: str | None, url: str | None, title: s
     )
     db.add(m)
     db.commit()
+    response_cache.invalidate("mentions")
     return m
+
+# --- Bulk ingestion ---
+
+def analyze_record(record: dict) -> dict:
+    """Mention row for one input record: title, text (or body), url, source"""
+    text = record.get("text", record.get("body"))
+    title = record.get("title")
+    if not title and not text:
+        raise ValueError("record needs a title or text")
+    signals = analyze_text(text or title or "")
+    return {
+        "source": record.get("source"),
+        "url": record.get("url"),
+        "title": title,
+        "text": text,
+        "sentiment": signals.sentiment,
+        "topic": signals.topic,
+        "is_misinfo": signals.is_misinfo,
+        "suggestion": make_suggestion(signals.topic, signals.sentiment, signals.is_misinfo),
+    }
+
+def _analyze_safe(record: dict) -> Tuple[Optional[dict], Optional[str]]:
+    try:
+        return analyze_record(record), None
+    except Exception as e:
+        return None, f"{type(e).__name__}: {e}"
+
+def parse_jsonl(lines: Iterable) -> Iterator[Tuple[int, Optional[dict], Optional[str]]]:
+    """(line number, record, error) for each non-blank JSON line"""
+    for lineno, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            yield lineno, None, f"invalid JSON: {e}"
+            continue
+        if not isinstance(record, dict):
+            yield lineno, None, "expected a JSON object"
+            continue
+        yield lineno, record, None
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+def _analysis_pool(workers: int) -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn: forking a process that runs threads (uvicorn, job runner) isn't safe
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=mp.get_context("spawn"))
+        return _pool
+
+def shutdown_analysis_pool() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(cancel_futures=True)
+            _pool = None
+
+def _analyze_many(records: List[dict], workers: int) -> List[Tuple[Optional[dict], Optional[str]]]:
+    # Below a few hundred records, pickling to the workers costs more than the scan itself
+    if workers <= 0 or len(records) < 256:
+        return [_analyze_safe(r) for r in records]
+    chunksize = max(64, len(records) // (workers * 4))
+    return list(_analysis_pool(workers).map(_analyze_safe, records, chunksize=chunksize))
+
+def _existing_urls(db: Session, urls: List[str]) -> set:
+    found = set()
+    for start in range(0, len(urls), 500):  # stay under SQLite's bound-parameter limit
+        found.update(db.scalars(select(Mention.url).where(Mention.url.in_(urls[start:start + 500]))))
+    return found
+
+def ingest_mentions(db: Session, lines: Iterable, batch_size: int = settings.MENTION_BATCH_SIZE,
+                    workers: int = settings.MENTION_WORKERS, keep_items: bool = True,
+                    progress: Callable[[int], None] | None = None) -> dict:
+    """Analyze and store JSONL mentions, one bulk INSERT + commit per batch_size records.
+
+    Mentions whose URL is already stored, or repeated earlier in the input, are
+    skipped as duplicates. With keep_items, the summary lists each line's
+    outcome; otherwise it holds counts and the first few errors.
+    """
+    summary = {"total": 0, "inserted": 0, "duplicates": 0, "errors": 0}
+    items: List[dict] = []
+    errors: List[dict] = []
+    seen_urls: set = set()
+
+    def note(item: dict) -> None:
+        summary["total"] += 1
+        if item["status"] == "error":
+            summary["errors"] += 1
+            if len(errors) < 20:
+                errors.append(item)
+        elif item["status"] == "duplicate":
+            summary["duplicates"] += 1
+        else:
+            summary["inserted"] += 1
+        if keep_items:
+            items.append(item)
+
+    def flush(batch: List[Tuple[int, Optional[dict], Optional[str]]]) -> None:
+        urls = list({r["url"] for _, r, _ in batch if r and r.get("url")} - seen_urls)
+        existing = _existing_urls(db, urls) if urls else set()
+        outcome: dict = {}
+        todo: List[Tuple[int, dict]] = []
+        for lineno, record, error in batch:
+            url = record.get("url") if record else None
+            if error:
+                outcome[lineno] = {"line": lineno, "status": "error", "error": error}
+            elif url and (url in existing or url in seen_urls):
+                outcome[lineno] = {"line": lineno, "status": "duplicate", "url": url}
+            else:
+                todo.append((lineno, record))
+
+        # A repeated URL is a duplicate only of a line that is actually stored, so a
+        # line that fails analysis doesn't cause later lines with its URL to be dropped
+        rows, batch_urls = [], set()
+        for (lineno, record), (row, error) in zip(todo, _analyze_many([r for _, r in todo], workers)):
+            url = record.get("url")
+            if url and url in batch_urls:
+                outcome[lineno] = {"line": lineno, "status": "duplicate", "url": url}
+                continue
+            if error:
+                outcome[lineno] = {"line": lineno, "status": "error", "error": error}
+                continue
+            rows.append(row)
+            if url:
+                batch_urls.add(url)
+            outcome[lineno] = {
+                "line": lineno, "status": "inserted", "url": row["url"], "sentiment": row["sentiment"],
+                "topic": row["topic"], "is_misinfo": row["is_misinfo"], "suggestion": row["suggestion"],
+            }
+        if rows:
+            db.execute(insert(Mention), rows)
+            db.commit()
+            response_cache.invalidate("mentions")
+        # Only once committed: if the insert fails, later lines with these URLs still get their turn
+        seen_urls.update(batch_urls)
+        for lineno, _, _ in batch:
+            note(outcome[lineno])
+        if progress:
+            progress(summary["total"])
+
+    batch = []
+    for parsed in parse_jsonl(lines):
+        batch.append(parsed)
+        if len(batch) >= batch_size:
+            flush(batch)
+            batch = []
+    if batch:
+        flush(batch)
+
+    if keep_items:
+        summary["items"] = items
+    else:
+        summary["error_sample"] = errors
+    return summary
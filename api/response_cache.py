@@ -0,0 +1,159 @@
+import hashlib
+import json
+import time
+from dataclasses import dataclass, field
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+
+from api import shared_store
+from api.config import settings
+
+@dataclass
+class CachedBody:
+    body: bytes
+    etag: str
+    last_modified: float  # epoch seconds the content last changed
+    expires_at: float  # epoch seconds, so every worker agrees on it
+    tags: Tuple[str, ...]
+    headers: Dict[str, str] = field(default_factory=dict)
+    versions: Tuple[int, ...] = ()  # of the "*" and tag versions when computed
+
+    def to_bytes(self) -> bytes:
+        meta = {"etag": self.etag, "last_modified": self.last_modified, "expires_at": self.expires_at,
+                "tags": self.tags, "headers": self.headers, "versions": self.versions}
+        return json.dumps(meta).encode() + b"\n" + self.body
+
+    @classmethod
+    def from_bytes(cls, raw: bytes) -> "CachedBody":
+        meta, body = raw.split(b"\n", 1)
+        meta = json.loads(meta)
+        return cls(body, meta["etag"], meta["last_modified"], meta["expires_at"], tuple(meta["tags"]),
+                   meta["headers"], tuple(meta["versions"]))
+
+@dataclass
+class WithHeaders:
+    """compute() result whose response needs extra headers (e.g. X-Next-Cursor), cached along with it"""
+    content: object
+    headers: Dict[str, str]
+
+class ResponseCache:
+    """TTL cache of rendered JSON responses for polled dashboard endpoints.
+
+    Entries carry tags ("analytics", "mentions") so writers can drop everything
+    that depends on the data they changed: invalidate() bumps the tags'
+    versions in the shared store, and an entry computed under older versions
+    is stale. With a shared store (CACHE_BACKEND=file) entries, versions and
+    the per-key recompute lock are seen by every worker, so one worker's
+    invalidation reaches all of them and only one request across the workers
+    recomputes an expired entry while the others wait for its result. Each
+    worker keeps the entries it has read in memory as well.
+    """
+
+    def __init__(self, ttl: float = settings.RESPONSE_CACHE_TTL, store=None):
+        self.ttl = ttl
+        self.store = store if store is not None else shared_store.store
+        self._entries: Dict[str, CachedBody] = {}
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        self.invalidations = 0
+
+    def _versions(self, tags: Tuple[str, ...]) -> Tuple[int, ...]:
+        return tuple(self.store.version(f"response:{tag}") for tag in ("*",) + tags)
+
+    def _lookup(self, key: str, versions: Tuple[int, ...]) -> Tuple[Optional[CachedBody], bool]:
+        """(latest entry for key or None, whether it is still fresh)"""
+        entry = self._entries.get(key)
+        if entry is not None and entry.versions == versions and entry.expires_at > time.time():
+            return entry, True
+        if self.store.shared:
+            raw = self.store.get(f"response:{key}")
+            if raw is not None:
+                shared = CachedBody.from_bytes(raw)
+                if entry is None or shared.expires_at >= entry.expires_at:
+                    entry = shared
+                    self._entries[key] = entry
+        fresh = entry is not None and entry.versions == versions and entry.expires_at > time.time()
+        return entry, fresh
+
+    def get_or_compute(self, key: str, tags: Iterable[str], compute: Callable[[], object]) -> CachedBody:
+        tags = tuple(tags)
+        entry, fresh = self._lookup(key, self._versions(tags))
+        if fresh:
+            self.hits += 1
+            return entry
+
+        with self.store.lock(f"response:{key}"):
+            # Another request (or worker) may have refreshed it while we waited
+            versions = self._versions(tags)
+            previous, fresh = self._lookup(key, versions)
+            if fresh:
+                self.hits += 1
+                return previous
+
+            self.misses += 1
+            content, headers = compute(), {}
+            if isinstance(content, WithHeaders):
+                content, headers = content.content, content.headers
+            body = json.dumps(jsonable_encoder(content), separators=(",", ":")).encode()
+            etag = '"%s"' % hashlib.blake2b(body, digest_size=16).hexdigest()
+            # Unchanged content keeps its Last-Modified so conditional requests still match
+            last_modified = previous.last_modified if previous and previous.etag == etag else time.time()
+            # An invalidation during compute() may mean we read old data; serve it once, don't keep it
+            keep = self._versions(tags) == versions
+            entry = CachedBody(body, etag, last_modified, time.time() + self.ttl if keep else 0.0, tags,
+                               headers, versions)
+            self._entries[key] = entry
+            if keep and self.store.shared:
+                self.store.put(f"response:{key}", entry.to_bytes())
+            return entry
+
+    def invalidate(self, *tags: str) -> None:
+        """Expire every entry carrying any of the tags (all entries if none given), in every worker"""
+        self.store.bump(*(f"response:{tag}" for tag in (tags or ("*",))))
+        self.invalidations += 1
+
+    def stats(self) -> dict:
+        return {
+            "ttl": self.ttl,
+            "shared": self.store.shared,
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "not_modified": self.not_modified,
+            "invalidations": self.invalidations,
+        }
+
+    def respond(self, request: Request, key: str, tags: Iterable[str], compute: Callable[[], object]) -> Response:
+        """Serve compute()'s JSON from the cache with ETag/Last-Modified, or 304 if the client is current"""
+        entry = self.get_or_compute(key, tags, compute)
+        headers = {
+            **entry.headers,
+            "ETag": entry.etag,
+            "Last-Modified": formatdate(entry.last_modified, usegmt=True),
+            "Cache-Control": "no-cache",
+        }
+        if _not_modified(request, entry):
+            self.not_modified += 1
+            return Response(status_code=304, headers=headers)
+        return Response(content=entry.body, media_type="application/json", headers=headers)
+
+def _not_modified(request: Request, entry: CachedBody) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        # If-None-Match wins over If-Modified-Since (RFC 9110 13.1.3)
+        tags = [t.strip().removeprefix("W/") for t in if_none_match.split(",")]
+        return "*" in tags or entry.etag in tags
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            since = parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+        return int(entry.last_modified) <= since
+    return False
+
+response_cache = ResponseCache()
@@ -0,0 +1,90 @@
+import os
+
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session
+
+from db.database import get_db, pool_stats
+from api.faq_service import faq_cache
+from api.kpis import rebuild_convo_rollup
+from api.shared_store import store
+from api.response_cache import response_cache
+from api.message_log import message_log
+
+router = APIRouter(prefix="/admin", tags=["admin"])
+
+@router.get("/faq-cache")
+def faq_cache_status():
+    """Report the FAQ matching cache generation and when it was last built"""
+    return faq_cache.stats()
+
+@router.post("/faq-cache/reload")
+def faq_cache_reload(db: Session = Depends(get_db)):
+    """Force a full rebuild of the FAQ matching cache, here now and in the other workers on their next check"""
+    faq_cache.reload(db)
+    return faq_cache.stats()
+
+@router.post("/convo-rollup/rebuild")
+def convo_rollup_rebuild(db: Session = Depends(get_db)):
+    """Recompute the hourly conversation KPI rollup from messages and feedback"""
+    return {"ok": True, "buckets": rebuild_convo_rollup(db)}
+
+@router.get("/response-cache")
+def response_cache_status():
+    """Hit/miss counters for the cached dashboard summaries"""
+    return response_cache.stats()
+
+@router.post("/response-cache/clear")
+def response_cache_clear():
+    response_cache.invalidate()
+    return response_cache.stats()
+
+@router.get("/shared-store")
+def shared_store_status():
+    """Which store the caches share between workers, and which worker answered"""
+    return {"worker_pid": os.getpid(), **store.stats()}
+
+@router.get("/db-pool")
+def db_pool_status():
+    """Connection counts and checkout wait times for the sync and async engines"""
+    return {name: stats.snapshot() for name, stats in pool_stats.items()}
+
+@router.get("/message-log")
+def message_log_status():
+    """Write-behind chat logging queue depth and flush counters"""
+    return message_log.stats()
+
+# Lexicons and templates are imported on use, and only where their router is enabled:
+# this router also serves workers that don't load reputation or generate (ENABLED_ROUTERS)
+def _require_router(name: str) -> None:
+    from api.main import ENABLED  # at request time; api.main imports this module while it loads
+    if name not in ENABLED:
+        raise HTTPException(status_code=404, detail=f"The {name} router is not enabled on this worker")
+
+@router.get("/lexicons")
+def lexicons_status():
+    _require_router("reputation")
+    from api.lexicon import lexicons
+    return lexicons.stats()
+
+@router.post("/lexicons/reload")
+def lexicons_reload():
+    """Recompile the reputation lexicons now instead of waiting for the mtime check"""
+    _require_router("reputation")
+    from api.lexicon import lexicons
+    lexicons.reload()
+    return lexicons.stats()
+
+@router.get("/templates")
+def templates_status():
+    """Compiled generation templates and rendered-output cache counters"""
+    _require_router("generate")
+    from api.generation import templates
+    return templates.stats()
+
+@router.post("/templates/reload")
+def templates_reload():
+    """Recompile the templates and empty the render cache now instead of waiting for the mtime check"""
+    _require_router("generate")
+    from api.generation import templates
+    templates.load()
+    return templates.stats()
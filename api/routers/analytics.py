@@ -1,21 +1,47 @@
-from fastapi import APIRouter, Depends
+from typing import Literal
+from fastapi import APIRouter, Depends, HTTPException, Request
 from sqlalchemy.orm import Session
 
-from db.database import get_db
-from api.analytics import run_rfm, segment_counts, top_at_risk, recent_negative_mentions, convo_kpis
+from db.database import get_db, SessionLocal
+from api.dashboard import segment_counts, top_at_risk, recent_negative_mentions
+from api.kpis import convo_kpis
+from api.jobs import Job, job_runner
+from api.response_cache import response_cache
 
 router = APIRouter(prefix="/analytics", tags=["analytics"])
 
-@router.post("/run")
-def analytics_run(db: Session = Depends(get_db)):
-    result = run_rfm(db)
-    return {"ok": True, "result": result}
+def _rfm_job(job: Job) -> dict:
+    from api.analytics import run_rfm  # pandas loads with the first run, not at startup
+
+    db = SessionLocal()
+    try:
+        return run_rfm(db, mode=job.params["mode"], progress=lambda rows: job_runner.progress(job, rows))
+    finally:
+        db.close()
+
+@router.post("/run", status_code=202)
+def analytics_run(mode: Literal["full", "incremental"] = "full"):
+    """Queue an RFM run; a run already queued or in progress is returned instead"""
+    job, created = job_runner.submit("rfm", _rfm_job, params={"mode": mode}, exclusive_key="rfm")
+    return {"ok": True, "job_id": job.id, "state": job.state, "coalesced": not created}
+
+@router.get("/jobs/{job_id}")
+def analytics_job(job_id: str):
+    job = job_runner.status(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="job not found")
+    return job
 
 @router.get("/summary")
-def analytics_summary(db: Session = Depends(get_db)):
-    return {
-        "segments": segment_counts(db),
-        "top_risk": top_at_risk(db, limit=10),
-        "convo_kpis": convo_kpis(db),
-        "recent_negative": recent_negative_mentions(db, limit=5)
-    }
+def analytics_summary(request: Request, window: Literal["24h", "7d", "30d", "all"] = "all",
+                      db: Session = Depends(get_db)):
+    # Cached for RESPONSE_CACHE_TTL; RFM runs and new mentions invalidate it
+    return response_cache.respond(
+        request, f"analytics/summary?window={window}", ("analytics", "mentions"),
+        lambda: {
+            "segments": segment_counts(db),
+            "top_risk": top_at_risk(db, limit=10),
+            "convo_kpis": convo_kpis(db, window=window),
+            "recent_negative": recent_negative_mentions(db, limit=5)
+        }
+    )
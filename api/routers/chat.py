@@ -1,10 +1,18 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from pydantic import BaseModel
-from typing import Optional
-from db.database import get_db
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from pydantic import BaseModel, Field
+from typing import List, Optional, Tuple
+from db.database import get_async_db, SessionLocal
 from db.models.models import Message
+from api.config import settings
 from api.faq_service import FAQService
+from api.kpis import record_messages
+from api.message_log import message_log, MessageLogFull
+from api.metrics import CHAT_STAGE_SECONDS
+from api.pagination import InvalidCursor, decode_cursor, newest_first, split_page
+from api.streaming import ndjson_export
 
 router = APIRouter()
 
@@ -16,45 +24,115 @@ class ChatResponse(BaseModel):
     confidence_score: Optional[float] = None
     message_id: Optional[int] = None
 
-@router.post("/chat", response_model=ChatResponse)
-async def chat_endpoint(request: ChatRequest, db: Session = Depends(get_db)):
-    """Handle chat requests and return AI responses"""
-    try:
-        # Initialize FAQ service
-        faq_service = FAQService(db)
+MAX_BATCH_MESSAGES = 1000
 
-        # Find best matching FAQ
-        response, confidence = faq_service.find_best_match(request.message)
+class ChatBatchRequest(BaseModel):
+    messages: List[str] = Field(..., min_length=1, max_length=MAX_BATCH_MESSAGES)
 
-        if not response:
-            response = faq_service.get_fallback_response()
-            confidence = 0.0
+class ChatBatchResponse(BaseModel):
+    results: List[ChatResponse]
 
-        # Save message to database
-        db_message = Message(
-            user_message=request.message,
-            bot_response=response,
-            confidence_score=confidence
-        )
+def _answer(messages: List[str]) -> List[Tuple[str, float]]:
+    """Match messages against the FAQ catalog; CPU-bound, so run it in the threadpool"""
+    # The sync session is only used when the FAQ cache checks for catalog changes
+    with CHAT_STAGE_SECONDS.time("match"), SessionLocal() as db:
+        faq_service = FAQService(db)
+        fallback = faq_service.get_fallback_response()
+        return [
+            (response, confidence) if response else (fallback, 0.0)
+            for response, confidence in faq_service.find_best_matches(messages)
+        ]
+
+@router.post("/chat", response_model=ChatResponse)
+async def chat_endpoint(request: ChatRequest, db: AsyncSession = Depends(get_async_db)):
+    """Handle chat requests and return AI responses"""
+    try:
+        # Find best matching FAQ (falls back to the support message)
+        [(response, confidence)] = await run_in_threadpool(_answer, [request.message])
+        row = {
+            "user_message": request.message,
+            "bot_response": response,
+            "confidence_score": confidence
+        }
 
-        db.add(db_message)
-        db.commit()
-        db.refresh(db_message)
+        with CHAT_STAGE_SECONDS.time("persist"):
+            if message_log.enabled:
+                # Queued for the write-behind flusher; the id is allocated up front
+                [message_id] = await run_in_threadpool(message_log.log, [row])
+            else:
+                # Save message to database
+                db_message = Message(**row)
+                db.add(db_message)
+                await db.run_sync(record_messages, [confidence])
+                await db.commit()
+                message_id = db_message.id
 
         return ChatResponse(
             response=response,
             confidence_score=confidence,
-            message_id=db_message.id
+            message_id=message_id
         )
 
+    except MessageLogFull as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error processing chat request: {str(e)}")
 
+@router.post("/chat/batch", response_model=ChatBatchResponse)
+async def chat_batch_endpoint(request: ChatBatchRequest, db: AsyncSession = Depends(get_async_db)):
+    """Answer many chat messages at once; results are returned in input order"""
+    try:
+        rows = [
+            {
+                "user_message": message,
+                "bot_response": response,
+                "confidence_score": confidence
+            }
+            for message, (response, confidence) in zip(
+                request.messages, await run_in_threadpool(_answer, request.messages)
+            )
+        ]
+
+        with CHAT_STAGE_SECONDS.time("persist"):
+            if message_log.enabled:
+                message_ids = await run_in_threadpool(message_log.log, rows)
+            else:
+                # One multi-row INSERT ... RETURNING; ids come back in parameter order
+                message_ids = (await db.scalars(
+                    insert(Message).returning(Message.id, sort_by_parameter_order=True),
+                    rows
+                )).all()
+                await db.run_sync(record_messages, [row["confidence_score"] for row in rows])
+                await db.commit()
+
+        return ChatBatchResponse(results=[
+            ChatResponse(
+                response=row["bot_response"],
+                confidence_score=row["confidence_score"],
+                message_id=message_id
+            )
+            for row, message_id in zip(rows, message_ids)
+        ])
+
+    except MessageLogFull as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error processing chat batch: {str(e)}")
+
 @router.get("/messages")
-async def get_messages(limit: int = 10, db: Session = Depends(get_db)):
-    """Get recent chat messages"""
+async def get_messages(response: Response, limit: int = Query(10, ge=1, le=settings.PAGE_SIZE_MAX),
+                       cursor: Optional[str] = None, db: AsyncSession = Depends(get_async_db)):
+    """Get recent chat messages, newest first; X-Next-Cursor (passed back as ?cursor=) fetches the next page"""
     try:
-        messages = db.query(Message).order_by(Message.timestamp.desc()).limit(limit).all()
+        after = decode_cursor(cursor) if cursor else None
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    try:
+        stmt = newest_first(select(Message), Message.timestamp, Message.id, after, limit,
+                            db.get_bind().dialect.name)
+        rows, next_cursor = split_page((await db.execute(stmt)).all(), limit)
+        if next_cursor:
+            response.headers["X-Next-Cursor"] = next_cursor
         return [
             {
                 "id": msg.id,
@@ -63,7 +141,15 @@ async def get_messages(limit: int = 10, db: Session = Depends(get_db)):
                 "confidence_score": msg.confidence_score,
                 "timestamp": msg.timestamp
             }
-            for msg in messages
+            for msg in (row.Message for row in rows)
         ]
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error retrieving messages: {str(e)}")
+
+@router.get("/messages/export")
+async def export_messages(limit: Optional[int] = Query(None, ge=1)):
+    """All chat messages (or the newest limit), newest first, streamed as NDJSON"""
+    stmt = select(
+        Message.id, Message.user_message, Message.bot_response, Message.confidence_score, Message.timestamp
+    ).order_by(Message.timestamp.desc(), Message.id.desc())
+    return ndjson_export(stmt.limit(limit) if limit else stmt)
@@ -1,11 +1,19 @@
+import asyncio
+import time
+
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel, Field
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Optional
 
-from db.database import get_db
+from db.database import get_async_db
 from db.models.models import Message
+from api.config import settings
 from api.models import Feedback
+from api.kpis import record_feedback
+from api.message_log import message_log
 
 router = APIRouter(prefix="/feedback", tags=["feedback"])
 
@@ -14,11 +22,25 @@ class FeedbackIn(BaseModel):
     helpful: bool
     comment: Optional[str] = None
 
+async def _message_exists(db: AsyncSession, message_id: int) -> bool:
+    # A message still in the write-behind queue counts as existing
+    if await db.get(Message, message_id) or message_log.pending(message_id):
+        return True
+    if not message_log.enabled or not await run_in_threadpool(message_log.ids.issued, message_id):
+        return False
+    # Allocated but not written: it may be queued in another worker, so wait for its flush
+    deadline = time.monotonic() + settings.FEEDBACK_PENDING_WAIT
+    while time.monotonic() < deadline:
+        await asyncio.sleep(message_log.flush_interval)
+        await db.rollback()  # end the read transaction so the next query sees newly committed rows
+        if await db.scalar(select(Message.id).where(Message.id == message_id)) or message_log.pending(message_id):
+            return True
+    return False
+
 @router.post("")
-def submit_feedback(payload: FeedbackIn, db: Session = Depends(get_db)):
+async def submit_feedback(payload: FeedbackIn, db: AsyncSession = Depends(get_async_db)):
     # Optional: verify message exists (soft check; skip FK for MVP)
-    msg = db.get(Message, payload.message_id)
-    if not msg:
+    if not await _message_exists(db, payload.message_id):
         raise HTTPException(status_code=404, detail="message_id not found")
 
     fb = Feedback(
@@ -27,5 +49,6 @@ def submit_feedback(payload: FeedbackIn, db: Session = Depends(get_db)):
         comment=payload.comment
     )
     db.add(fb)
-    db.commit()
+    await db.run_sync(record_feedback, payload.helpful)
+    await db.commit()
     return {"ok": True, "feedback_id": fb.id}
@@ -1,14 +1,28 @@
+import hashlib
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.concurrency import iterate_in_threadpool, run_in_threadpool
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
-from sqlalchemy.orm import Session
-from typing import Literal, Optional
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Literal, Optional, Tuple
 
-from db.database import get_db
-from api.models import ContentLog
-from api.generation import render_template
+from db.database import get_async_db, dialect_insert, AsyncSessionLocal
+from api.config import settings
+from api.models import ContentBlob, ContentLog
+from api.generation import render_template, templates
+from api.streaming import SSE_HEADERS, sse
 
 router = APIRouter(prefix="/generate", tags=["generate"])
 
+Kind = Literal["post", "speech", "slogan"]
+
+TEMPLATES = {
+    "post": "social_post.md.j2",
+    "speech": "speech.md.j2",
+    "slogan": "slogan.md.j2",
+}
+
 class GenIn(BaseModel):
     topic: str = Field(..., min_length=2)
     audience: str = "general"
@@ -20,43 +34,98 @@ class GenOut(BaseModel):
     text: str
     meta: dict
 
-def _log_and_return(db: Session, kind: str, inputs: dict, text: str):
-    entry = ContentLog(type=kind, inputs=inputs, output=text)
-    db.add(entry)
-    db.commit()
-    return {"text": text, "meta": {"id": entry.id, "type": kind}}
+class GenBatchItem(GenIn):
+    kind: Kind
 
-@router.post("/post", response_model=GenOut)
-def generate_post(payload: GenIn, db: Session = Depends(get_db)):
-    text = render_template(
-        "social_post.md.j2",
+class GenBatchIn(BaseModel):
+    items: List[GenBatchItem] = Field(..., min_length=1, max_length=settings.GENERATE_BATCH_MAX)
+
+class GenBatchOut(BaseModel):
+    results: List[GenOut]
+
+def _params(kind: str, payload: GenIn) -> dict:
+    params = dict(
         topic=payload.topic,
         audience=payload.audience,
         tone=payload.tone,
-        length=payload.length,
         constraints=payload.constraints or ""
     )
-    return _log_and_return(db, "post", payload.model_dump(), text)
+    if kind != "slogan":
+        params["length"] = payload.length
+    return params
 
-@router.post("/speech", response_model=GenOut)
-def generate_speech(payload: GenIn, db: Session = Depends(get_db)):
-    text = render_template(
-        "speech.md.j2",
-        topic=payload.topic,
-        audience=payload.audience,
-        tone=payload.tone,
-        length=payload.length,
-        constraints=payload.constraints or ""
+def _render(kind: str, payload: GenIn) -> str:
+    return render_template(TEMPLATES[kind], **_params(kind, payload))
+
+def _render_all(items: List[GenBatchItem]) -> List[str]:
+    texts = []
+    for item in items:
+        try:
+            texts.append(_render(item.kind, item))
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Error rendering {item.kind}: {str(e)}")
+    return texts
+
+async def _log(db: AsyncSession, entries: List[Tuple[str, dict, str]]) -> List[dict]:
+    """Write (kind, inputs, text) entries in one transaction; each distinct text is stored once"""
+    digests = [hashlib.sha256(text.encode()).hexdigest() for _, _, text in entries]
+    blobs = {digest: text for digest, (_, _, text) in zip(digests, entries)}
+    await db.execute(
+        dialect_insert(db, ContentBlob).on_conflict_do_nothing(index_elements=["hash"]),
+        [{"hash": digest, "text": text} for digest, text in blobs.items()]
     )
-    return _log_and_return(db, "speech", payload.model_dump(), text)
+    ids = (await db.scalars(
+        insert(ContentLog).returning(ContentLog.id, sort_by_parameter_order=True),
+        [
+            {"type": kind, "inputs": inputs, "output": "", "output_hash": digest}
+            for (kind, inputs, _), digest in zip(entries, digests)
+        ]
+    )).all()
+    await db.commit()
+    return [
+        {"text": text, "meta": {"id": entry_id, "type": kind, "output_hash": digest}}
+        for (kind, _, text), digest, entry_id in zip(entries, digests, ids)
+    ]
+
+async def _render_and_log(db: AsyncSession, kind: str, payload: GenIn):
+    # Template reloads and rendering are blocking work; keep them off the event loop
+    text = await run_in_threadpool(_render, kind, payload)
+    return (await _log(db, [(kind, payload.model_dump(), text)]))[0]
+
+@router.post("/post", response_model=GenOut)
+async def generate_post(payload: GenIn, db: AsyncSession = Depends(get_async_db)):
+    return await _render_and_log(db, "post", payload)
+
+@router.post("/speech", response_model=GenOut)
+async def generate_speech(payload: GenIn, db: AsyncSession = Depends(get_async_db)):
+    return await _render_and_log(db, "speech", payload)
 
 @router.post("/slogan", response_model=GenOut)
-def generate_slogan(payload: GenIn, db: Session = Depends(get_db)):
-    text = render_template(
-        "slogan.md.j2",
-        topic=payload.topic,
-        audience=payload.audience,
-        tone=payload.tone,
-        constraints=payload.constraints or ""
-    )
-    return _log_and_return(db, "slogan", payload.model_dump(), text)
+async def generate_slogan(payload: GenIn, db: AsyncSession = Depends(get_async_db)):
+    return await _render_and_log(db, "slogan", payload)
+
+@router.post("/batch", response_model=GenBatchOut)
+async def generate_batch(payload: GenBatchIn, db: AsyncSession = Depends(get_async_db)):
+    """Render many variants and log them with one bulk insert; results follow the input order"""
+    texts = await run_in_threadpool(_render_all, payload.items)
+    entries = [(item.kind, item.model_dump(exclude={"kind"}), text) for item, text in zip(payload.items, texts)]
+    return {"results": await _log(db, entries)}
+
+@router.post("/{kind}/stream")
+async def generate_stream(kind: Kind, payload: GenIn):
+    """Server-Sent Events: a "chunk" event per rendered line, then "done" with the logged entry's meta"""
+    async def events():
+        parts = []
+        try:
+            async for line in iterate_in_threadpool(templates.stream(TEMPLATES[kind], **_params(kind, payload))):
+                parts.append(line)
+                yield sse("chunk", {"text": line})
+            # The session lives in the generator; the request's dependencies are gone by now
+            async with AsyncSessionLocal() as db:
+                [result] = await _log(db, [(kind, payload.model_dump(), "".join(parts))])
+        except Exception as e:
+            yield sse("error", {"detail": f"Error generating {kind}: {str(e)}"})
+            return
+        yield sse("done", result["meta"])
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers=SSE_HEADERS)
@@ -0,0 +1,49 @@
+import sys
+
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from api.metrics import registry
+from api.faq_service import faq_cache
+from api.message_log import message_log
+from api.response_cache import response_cache
+from db.database import pool_stats
+
+router = APIRouter(tags=["metrics"])
+
+def _pool_field(field: str):
+    return lambda: {(name,): stats.snapshot().get(field, 0) for name, stats in pool_stats.items()}
+
+# Values owned by other modules, read at scrape time
+for _name, _field, _kind, _help in (
+    ("db_pool_checked_out", "checked_out", "gauge", "Connections currently checked out"),
+    ("db_pool_overflow", "overflow", "gauge", "Connections open beyond pool_size"),
+    ("db_pool_size", "size", "gauge", "Configured pool size"),
+    ("db_pool_connects_total", "connects", "counter", "Connections opened"),
+    ("db_pool_checkouts_total", "checkouts", "counter", "Pool checkouts"),
+    ("db_pool_checkout_timeouts_total", "checkout_timeouts", "counter", "Checkouts that timed out waiting"),
+):
+    registry.gauge(_name, _help, ("engine",), _pool_field(_field), kind=_kind)
+registry.gauge("db_pool_checkout_wait_max_seconds", "Longest wait for a pool connection", ("engine",),
+               lambda: {(n,): s.snapshot()["checkout_wait_max_ms"] / 1000 for n, s in pool_stats.items()})
+registry.gauge("response_cache_requests_total", "Dashboard response cache lookups by result", ("result",),
+               lambda: {(k,): v for k, v in response_cache.stats().items() if k in ("hits", "misses", "not_modified")},
+               kind="counter")
+def _template_cache() -> dict:
+    # Only workers serving /generate load the templates (and Jinja)
+    generation = sys.modules.get("api.generation")
+    if generation is None:
+        return {}
+    return {("hit",): generation.templates.hits, ("miss",): generation.templates.misses}
+
+registry.gauge("template_render_cache_requests_total", "Rendered template cache lookups by result", ("result",),
+               _template_cache, kind="counter")
+registry.gauge("faq_cache_generation", "FAQ catalog generation the matcher was built from", (),
+               lambda: {(): faq_cache.generation})
+registry.gauge("message_log_queued", "Chat messages waiting for the write-behind flusher", (),
+               lambda: {(): message_log.stats()["pending"]})
+
+@router.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """Prometheus scrape endpoint"""
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
@@ -1,10 +1,23 @@
-from fastapi import APIRouter, Depends
+import os
+import tempfile
+from typing import AsyncIterator
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
 from pydantic import BaseModel
+from sqlalchemy import select
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 
-from db.database import get_db
-from api.reputation import analyze_and_store
+from db.database import get_db, SessionLocal
+from api.config import settings
+from api.jobs import Job, job_runner
+from api.reputation import analyze_and_store, ingest_mentions
 from api.models import Mention
+from api.pagination import InvalidCursor, decode_cursor, newest_first, split_page
+from api.response_cache import WithHeaders, response_cache
+from api.streaming import ndjson_export
 
 router = APIRouter(prefix="/reputation", tags=["reputation"])
 
@@ -22,6 +35,8 @@ class RepOut(BaseModel):
 
 @router.post("/analyze", response_model=RepOut)
 def analyze(payload: RepIn, db: Session = Depends(get_db)):
+    # Plain def: the lexicon reload check and the shared-store cache invalidation block,
+    # so this runs in the threadpool rather than on the event loop
     m = analyze_and_store(db, payload.source, payload.url, payload.title, payload.text)
     return RepOut(
         sentiment=m.sentiment,
@@ -30,10 +45,119 @@ def analyze(payload: RepIn, db: Session = Depends(get_db)):
         suggestion=m.suggestion,
     )
 
+async def _body_chunks(request: Request) -> AsyncIterator[bytes]:
+    """Raw JSONL body, or the "file" field of a multipart upload"""
+    if request.headers.get("content-type", "").startswith("multipart/form-data"):
+        form = await request.form()
+        upload = form.get("file")
+        if upload is None or isinstance(upload, str):
+            raise HTTPException(status_code=400, detail="multipart upload needs a 'file' field")
+        while chunk := await upload.read(64 * 1024):
+            yield chunk
+    else:
+        async for chunk in request.stream():
+            yield chunk
+
+async def _body_lines(request: Request) -> AsyncIterator[bytes]:
+    rest = b""
+    async for chunk in _body_chunks(request):
+        lines = (rest + chunk).split(b"\n")
+        rest = lines.pop()
+        for line in lines:
+            yield line + b"\n"
+    if rest:
+        yield rest
+
+def _ingest_lines(lines: list[bytes]) -> dict:
+    db = SessionLocal()
+    try:
+        return ingest_mentions(db, lines)
+    finally:
+        db.close()
+
+def _ingest_job(job: Job) -> dict:
+    path = job.params["path"]
+    db = SessionLocal()
+    try:
+        with open(path, "rb") as f:
+            return ingest_mentions(db, f, keep_items=False, progress=lambda rows: job_runner.progress(job, rows))
+    finally:
+        db.close()
+        os.remove(path)
+
+@router.post("/analyze/batch")
+async def analyze_batch(request: Request):
+    """Analyze and store JSONL mentions (one {"title", "text", "url", "source"} per line).
+
+    Up to MENTION_SYNC_LIMIT lines are handled in the request and answered with
+    a per-line summary; larger inputs are spooled to disk and queued as a job.
+    """
+    lines = _body_lines(request)
+    head = []
+    async for line in lines:
+        head.append(line)
+        if len(head) > settings.MENTION_SYNC_LIMIT:
+            break
+    else:
+        return await run_in_threadpool(_ingest_lines, head)
+
+    fd, path = tempfile.mkstemp(prefix="mentions-", suffix=".jsonl")
+    try:
+        # Disk writes go to the threadpool, a few hundred lines at a time, off the event loop
+        with os.fdopen(fd, "wb") as f:
+            await run_in_threadpool(f.writelines, head)
+            chunk = []
+            async for line in lines:
+                chunk.append(line)
+                if len(chunk) >= 512:
+                    await run_in_threadpool(f.writelines, chunk)
+                    chunk = []
+            if chunk:
+                await run_in_threadpool(f.writelines, chunk)
+    except BaseException:
+        os.remove(path)
+        raise
+    job, _ = job_runner.submit("mention-ingest", _ingest_job, params={"path": path})
+    return JSONResponse(status_code=202, content={"ok": True, "job_id": job.id, "state": job.state})
+
+@router.get("/jobs/{job_id}")
+def reputation_job(job_id: str):
+    job = job_runner.status(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="job not found")
+    return job
+
+@router.get("/export")
+async def export_mentions(limit: int | None = Query(None, ge=1)):
+    """All analyzed mentions (or the newest limit), newest first, streamed as NDJSON"""
+    stmt = select(
+        Mention.id, Mention.title, Mention.source, Mention.url, Mention.sentiment, Mention.topic,
+        Mention.is_misinfo, Mention.suggestion, Mention.created_at
+    ).order_by(Mention.created_at.desc(), Mention.id.desc())
+    return ndjson_export(stmt.limit(limit) if limit else stmt)
+
+# Sync: the response cache's stampede lock blocks, so this runs in the threadpool
 @router.get("/summary")
-def reputation_summary(db: Session = Depends(get_db)):
-    rows = db.query(Mention).order_by(Mention.created_at.desc()).limit(10).all()
-    return [
+def reputation_summary(request: Request, limit: int = Query(10, ge=1, le=settings.PAGE_SIZE_MAX),
+                       cursor: str | None = None, db: Session = Depends(get_db)):
+    """Newest mentions first; pass a response's X-Next-Cursor header back as ?cursor= for the next page"""
+    try:
+        after = decode_cursor(cursor) if cursor else None
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    compute = lambda: _recent_mentions(db, limit, after)
+    if after is not None:
+        # Deeper pages skip the cache: they're cheap keyset scans and would only pile up entries
+        page = compute()
+        return JSONResponse(content=jsonable_encoder(page.content), headers=page.headers)
+    # First page cached for RESPONSE_CACHE_TTL; analyze_and_store invalidates it
+    return response_cache.respond(request, f"reputation/summary?limit={limit}", ("mentions",), compute)
+
+def _recent_mentions(db: Session, limit: int, after: tuple[str, int] | None) -> WithHeaders:
+    stmt = newest_first(select(Mention), Mention.created_at, Mention.id, after, limit,
+                        db.get_bind().dialect.name)
+    rows, next_cursor = split_page(db.execute(stmt).all(), limit)
+    content = [
         {
             "title": r.title,
             "source": r.source,
@@ -44,5 +168,6 @@ def reputation_summary(db: Session = Depends(get_db)):
             "suggestion": r.suggestion,
             "created_at": r.created_at
         }
-        for r in rows
+        for r in (row.Mention for row in rows)
     ]
+    return WithHeaders(content, {"X-Next-Cursor": next_cursor} if next_cursor else {})
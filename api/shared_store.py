@@ -0,0 +1,180 @@
+import hashlib
+import os
+import stat
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional
+
+from api.config import settings
+
+def ensure_private_dir(path: str) -> str:
+    """Create path owner-only, or check that an existing one is ours and closed to everyone else.
+
+    Compiled templates are imported from these directories and FAQ matcher
+    snapshots unpickled from them: a directory another local user could
+    have created or written to must never be used.
+    """
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    st = os.lstat(path)
+    if (not stat.S_ISDIR(st.st_mode) or st.st_uid != os.getuid()
+            or stat.S_IMODE(st.st_mode) & 0o077):
+        raise PermissionError(f"{path} must be a directory owned by uid {os.getuid()} with mode 0700")
+    return path
+
+class MemoryStore:
+    """Blobs, version counters and locks for one process: the single-worker default.
+
+    Each worker gets its own, so caches built on it are per-worker and so are
+    their invalidations.
+    """
+
+    shared = False
+
+    def __init__(self):
+        self._blobs: Dict[str, bytes] = {}
+        self._versions: Dict[str, int] = {}
+        self._locks: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self._blobs.get(key)
+
+    def put(self, key: str, value: bytes) -> None:
+        self._blobs[key] = value
+
+    def version(self, name: str) -> int:
+        return self._versions.get(name, 0)
+
+    def bump(self, *names: str) -> None:
+        with self._lock:
+            for name in names:
+                self._versions[name] = self._versions.get(name, 0) + 1
+
+    def stats(self) -> dict:
+        return {"backend": "memory", "blobs": len(self._blobs), "versions": len(self._versions)}
+
+    def _key_lock(self, key: str) -> threading.Lock:
+        with self._lock:
+            return self._locks.setdefault(key, threading.Lock())
+
+    @contextmanager
+    def lock(self, key: str) -> Iterator[None]:
+        with self._key_lock(key):
+            yield
+
+    def try_lock(self, key: str):
+        """The lock for key if it is free, else None; call release() on it when done"""
+        lock = self._key_lock(key)
+        return lock if lock.acquire(blocking=False) else None
+
+class FileStore:
+    """The same interface on a directory every worker on the host can reach.
+
+    Meant for tmpfs (/dev/shm), so reads and writes never touch a disk. Blobs
+    are written to a temp file and renamed into place, so readers see the old
+    or the new value, never a partial one. A version is the mtime (ns) of an
+    empty marker file: bump() touches it and version() is a single stat().
+    Locks are flock()s, which exclude threads of the same worker as well as
+    other workers. The directory must belong to the server's user with mode
+    0700 (see ensure_private_dir); any other raises PermissionError at startup.
+    """
+
+    shared = True
+
+    def __init__(self, path: str):
+        # The FAQ matcher snapshots in here are unpickled: refuse a directory that isn't ours alone
+        self.path = ensure_private_dir(path)
+        for sub in ("blobs", "versions", "locks"):
+            os.makedirs(os.path.join(path, sub), mode=0o700, exist_ok=True)
+
+    def _file(self, kind: str, key: str) -> str:
+        return os.path.join(self.path, kind, hashlib.sha1(key.encode()).hexdigest())
+
+    def get(self, key: str) -> Optional[bytes]:
+        try:
+            with open(self._file("blobs", key), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def put(self, key: str, value: bytes) -> None:
+        path = self._file("blobs", key)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(value)
+            os.replace(tmp, path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
+    def version(self, name: str) -> int:
+        try:
+            return os.stat(self._file("versions", name)).st_mtime_ns
+        except FileNotFoundError:
+            return 0
+
+    def bump(self, *names: str) -> None:
+        for name in names:
+            path = self._file("versions", name)
+            # Strictly increasing even when two bumps land in the same clock tick
+            now = max(time.time_ns(), self.version(name) + 1)
+            with open(path, "ab"):
+                pass
+            os.utime(path, ns=(now, now))
+
+    def stats(self) -> dict:
+        return {
+            "backend": "file",
+            "path": self.path,
+            "blobs": len(os.listdir(os.path.join(self.path, "blobs"))),
+            "versions": len(os.listdir(os.path.join(self.path, "versions"))),
+        }
+
+    @contextmanager
+    def lock(self, key: str) -> Iterator[None]:
+        import fcntl
+        with open(self._file("locks", key), "ab") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def try_lock(self, key: str):
+        """The lock for key if no thread or worker holds it, else None; call release() on it when done.
+
+        Held for as long as the returned file stays open, and dropped by the
+        kernel if the worker dies, so a crash never leaves it taken.
+        """
+        import fcntl
+        f = open(self._file("locks", key), "ab")
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            f.close()
+            return None
+        return _HeldFile(f)
+
+class _HeldFile:
+    def __init__(self, f):
+        self._f = f
+
+    def release(self) -> None:
+        self._f.close()  # closing the file drops its flock
+
+def _default_dir() -> str:
+    base = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+    # Per user, so another account can't squat the name first
+    return os.path.join(base, f"ai_store-{os.getuid()}")
+
+def create_store(backend: str = settings.CACHE_BACKEND, path: str = settings.CACHE_DIR):
+    if backend == "memory":
+        return MemoryStore()
+    if backend == "file":
+        return FileStore(path or _default_dir())
+    raise ValueError(f"Unknown CACHE_BACKEND {backend!r}; expected 'memory' or 'file'")
+
+store = create_store()
@@ -0,0 +1,62 @@
+import sys
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional
+
+# Third-party packages worth calling out when a worker loads them
+HEAVY_MODULES = ("pandas", "numpy", "scipy", "pyarrow", "jinja2", "ahocorasick", "psycopg2", "asyncpg")
+
+class StartupReport:
+    """Wall time and newly imported packages for each boot step (router imports, lifespan tasks).
+
+    A coarse, always-on cousin of `python -X importtime`; run that for
+    per-module detail. The clock starts when api.main starts importing.
+    """
+
+    def __init__(self):
+        self._start = time.perf_counter()
+        self.steps: List[dict] = []
+        self.ready_seconds: Optional[float] = None
+
+    @contextmanager
+    def step(self, name: str) -> Iterator[None]:
+        before = set(sys.modules)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            new = set(sys.modules) - before
+            packages: Dict[str, int] = {}
+            for module in new:
+                top = module.split(".", 1)[0]
+                packages[top] = packages.get(top, 0) + 1
+            self.steps.append({
+                "step": name,
+                "seconds": round(elapsed, 4),
+                "modules": len(new),
+                # Packages first imported by this step, by module count
+                "packages": dict(sorted(packages.items(), key=lambda kv: -kv[1])[:10]),
+            })
+
+    def ready(self) -> None:
+        self.ready_seconds = round(time.perf_counter() - self._start, 4)
+
+    def to_dict(self) -> dict:
+        return {
+            "ready_seconds": self.ready_seconds,
+            "steps": self.steps,
+            "modules_loaded": len(sys.modules),
+            "heavy_modules_loaded": [m for m in HEAVY_MODULES if m in sys.modules],
+        }
+
+    def summary(self) -> str:
+        slowest = sorted(self.steps, key=lambda s: -s["seconds"])[:4]
+        heavy = [m for m in HEAVY_MODULES if m in sys.modules]
+        return (
+            f"🚀 Ready in {self.ready_seconds or 0:.2f}s, {len(sys.modules)} modules; slowest: "
+            + ", ".join(f"{s['step']} {s['seconds']:.2f}s" for s in slowest)
+            + f"; heavy: {', '.join(heavy) or 'none'}"
+        )
+
+startup_report = StartupReport()
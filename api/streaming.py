@@ -0,0 +1,41 @@
+import json
+from datetime import date
+from typing import AsyncIterator
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
+from sqlalchemy import Select
+
+from api.config import settings
+from db.database import AsyncSessionLocal
+
+def _default(value):
+    if isinstance(value, date):
+        return value.isoformat()
+    return jsonable_encoder(value)
+
+def _dumps(value) -> str:
+    # jsonable_encoder only for what json can't handle itself: it costs more than the query per row
+    return json.dumps(value, separators=(",", ":"), default=_default)
+
+def ndjson_export(stmt: Select) -> StreamingResponse:
+    """Stream stmt's rows as NDJSON, one object per row, through a server-side cursor.
+
+    stmt should select columns rather than ORM entities, so rows aren't kept in
+    a session's identity map and memory stays at one EXPORT_CHUNK_ROWS batch.
+    The session is opened inside the generator: dependency sessions are closed
+    before a streaming body finishes.
+    """
+    async def lines() -> AsyncIterator[str]:
+        async with AsyncSessionLocal() as db:
+            result = await db.stream(stmt.execution_options(yield_per=settings.EXPORT_CHUNK_ROWS))
+            async for rows in result.mappings().partitions():
+                yield "".join(_dumps(dict(row)) + "\n" for row in rows)
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+def sse(event: str, data) -> str:
+    """One Server-Sent Events frame with a JSON payload"""
+    return f"event: {event}\ndata: {_dumps(data)}\n\n"
+
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
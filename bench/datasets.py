@@ -0,0 +1,82 @@
+"""Seeded synthetic data for the benchmarks: FAQ catalogs, customer files, mentions and chat queries"""
+
+import json
+import random
+from datetime import date
+from typing import Iterator, List
+
+import numpy as np
+import pandas as pd
+
+TOPIC_WORDS = ["delivery", "price", "cost", "support", "service", "return", "refund", "order", "payment",
+               "account", "shipping", "warranty", "discount", "store", "hours", "exchange", "tracking"]
+SENTIMENT_WORDS = ["great", "good", "happy", "fast", "love", "bad", "angry", "delay", "poor", "scam", "rumor"]
+FILLER = ["the", "my", "is", "was", "how", "do", "i", "can", "you", "what", "when", "please", "why"]
+CITIES = ["Delhi", "Mumbai", "Pune", "Chennai", "Kolkata", "Jaipur", "Bengaluru", "Hyderabad"]
+
+def vocabulary(size: int) -> List[str]:
+    """Topic words plus size made-up keywords ("kw17"), so catalogs of any size stay distinct"""
+    return TOPIC_WORDS + [f"kw{i}" for i in range(size)]
+
+def faq_rows(n: int, seed: int = 0) -> List[dict]:
+    """n FAQ rows for the faqs table, 2-6 keywords each drawn from a Zipf-ish vocabulary"""
+    rng = random.Random(seed)
+    vocab = vocabulary(max(n // 2, 50))
+    weights = [1 / (i + 1) for i in range(len(vocab))]
+    rows = []
+    for i in range(n):
+        keywords = sorted(set(rng.choices(vocab, weights=weights, k=rng.randint(2, 6))))
+        rows.append({
+            "question": f"Question {i} about {' '.join(keywords)}?",
+            "answer": f"Answer {i}: details about {keywords[0]}.",
+            "keywords": json.dumps(keywords),
+        })
+    return rows
+
+def chat_queries(n: int, faqs: int, seed: int = 1) -> List[str]:
+    rng = random.Random(seed)
+    vocab = vocabulary(max(faqs // 2, 50))
+    return [
+        " ".join(rng.sample(FILLER, 3) + rng.sample(vocab, rng.randint(1, 4)))
+        for _ in range(n)
+    ]
+
+def mentions(n: int, seed: int = 2) -> Iterator[dict]:
+    rng = random.Random(seed)
+    for i in range(n):
+        words = rng.sample(TOPIC_WORDS, 2) + rng.sample(SENTIMENT_WORDS, rng.randint(0, 3)) + rng.sample(FILLER, 4)
+        rng.shuffle(words)
+        yield {
+            "source": rng.choice(["twitter", "reddit", "news", "blog"]),
+            "url": f"https://example.com/m/{seed}/{i}",
+            "title": " ".join(words[:4]),
+            "text": " ".join(words),
+        }
+
+def write_customers_csv(path: str, rows: int, seed: int = 3, chunk_size: int = 500_000) -> None:
+    """customers.csv with the columns run_rfm expects, written in chunks (10M rows stay in bounded memory)"""
+    rng = np.random.default_rng(seed)
+    today = np.datetime64(date.today(), "D")
+    header = True
+    for start in range(0, rows, chunk_size):
+        n = min(chunk_size, rows - start)
+        ids = np.arange(start, start + n).astype(str)
+        joined = rng.integers(0, 1500, n)
+        last = np.minimum(rng.integers(0, 400, n), joined)
+        frame = pd.DataFrame({
+            "id": np.char.add("C", np.char.zfill(ids, 8)),
+            "name": np.char.add("Customer ", ids),
+            "email": np.char.add(np.char.add("c", ids), "@example.com"),
+            "joined_at": (today - joined.astype("timedelta64[D]")).astype(str),
+            "city": rng.choice(CITIES, n),
+            "age": rng.integers(18, 75, n),
+            "last_purchase_at": (today - last.astype("timedelta64[D]")).astype(str),
+            "total_orders": rng.poisson(4, n),
+            "total_spend": np.round(rng.gamma(2.0, 4000.0, n), 2),
+        })
+        # A few customers who never bought anything
+        never = rng.random(n) < 0.02
+        frame.loc[never, "last_purchase_at"] = ""
+        frame.loc[never, ["total_orders", "total_spend"]] = 0
+        frame.to_csv(path, mode="w" if header else "a", header=header, index=False)
+        header = False
@@ -0,0 +1,324 @@
+#!/usr/bin/env python3
+"""
+Benchmark the hot paths in-process and through the FastAPI app
+Usage: python -m bench.run --preset small --out bench-results.json
+       python -m bench.run --compare old.json new.json
+
+Each case runs in a fresh interpreter against its own SQLite database in
+--workdir, so peak RSS is per case and results don't depend on run order.
+A case that crashes or outlives --case-timeout is killed and listed under
+"failures"; the exit status is then 1.
+Data is synthetic and seeded (bench/datasets.py); generated customer files
+are reused between runs.
+"""
+
+import argparse
+import json
+import multiprocessing as mp
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from queue import Empty
+from typing import Callable, List
+
+import numpy as np
+
+PRESETS = {
+    "small": {"faqs": [100, 1_000], "customers": [10_000], "mentions": 500, "queries": 1_000, "renders": 1_000},
+    "medium": {"faqs": [100, 10_000], "customers": [10_000, 1_000_000], "mentions": 2_000, "queries": 5_000,
+               "renders": 5_000},
+    "large": {"faqs": [100, 10_000, 100_000], "customers": [10_000, 1_000_000, 10_000_000], "mentions": 10_000,
+              "queries": 20_000, "renders": 20_000},
+}
+
+def _summary(name: str, mode: str, params: dict, latencies: List[float], total_seconds: float,
+             items: int, **extra) -> dict:
+    lat = np.asarray(latencies) * 1000
+    return {
+        "name": name,
+        "mode": mode,
+        "params": params,
+        "operations": len(latencies),
+        "items": items,
+        "seconds": round(total_seconds, 4),
+        "throughput_per_s": round(items / total_seconds, 2) if total_seconds else None,
+        "p50_ms": round(float(np.percentile(lat, 50)), 4),
+        "p95_ms": round(float(np.percentile(lat, 95)), 4),
+        "p99_ms": round(float(np.percentile(lat, 99)), 4),
+        **extra,
+    }
+
+def _measure(fn: Callable, args_list) -> tuple:
+    latencies = []
+    start = time.perf_counter()
+    for args in args_list:
+        t = time.perf_counter()
+        fn(*args)
+        latencies.append(time.perf_counter() - t)
+    return latencies, time.perf_counter() - start
+
+# --- cases (run inside the child process, after DATABASE_URL is set) ---
+
+def _seed_faqs(n: int) -> None:
+    from sqlalchemy import insert
+    from api.models import FAQ
+    from bench.datasets import faq_rows
+    from db.database import SessionLocal
+    with SessionLocal() as db:
+        rows = faq_rows(n)
+        for start in range(0, len(rows), 5000):
+            db.execute(insert(FAQ), rows[start:start + 5000])
+        db.commit()
+
+def case_faq_match(faqs: int, queries: int) -> List[dict]:
+    from api.faq_service import FAQService, faq_cache
+    from bench.datasets import chat_queries
+    from db.database import SessionLocal
+    _seed_faqs(faqs)
+    messages = chat_queries(queries, faqs)
+    with SessionLocal() as db:
+        service = FAQService(db)
+        t = time.perf_counter()
+        faq_cache.get_matcher(db)  # index build, reported separately
+        build = time.perf_counter() - t
+        latencies, total = _measure(service.find_best_match, [(m,) for m in messages])
+    return [_summary("find_best_match", "inprocess", {"faqs": faqs}, latencies, total, queries,
+                     index_build_seconds=round(build, 4))]
+
+def case_chat_api(faqs: int, queries: int) -> List[dict]:
+    from fastapi.testclient import TestClient
+    from api.main import app
+    from bench.datasets import chat_queries
+    _seed_faqs(faqs)
+    messages = chat_queries(queries, faqs)
+    with TestClient(app) as client:
+        client.post("/api/v1/chat", json={"message": "warmup"})
+        latencies, total = _measure(lambda m: client.post("/api/v1/chat", json={"message": m}).raise_for_status(),
+                                    [(m,) for m in messages])
+        batch = [messages[i:i + 100] for i in range(0, len(messages), 100)]
+        b_lat, b_total = _measure(lambda ms: client.post("/api/v1/chat/batch", json={"messages": ms}).raise_for_status(),
+                                  [(b,) for b in batch])
+    return [
+        _summary("POST /chat", "asgi", {"faqs": faqs}, latencies, total, queries),
+        _summary("POST /chat/batch", "asgi", {"faqs": faqs, "batch": 100}, b_lat, b_total, queries),
+    ]
+
+def case_render(renders: int) -> List[dict]:
+    from api.generation import render_template
+    templates = ["social_post.md.j2", "speech.md.j2", "slogan.md.j2"]
+    args = [(templates[i % 3],) for i in range(renders)]
+    render = lambda name: render_template(name, topic=f"topic {name}", audience="general", tone="friendly",
+                                          length="short", constraints="")
+    latencies, total = _measure(render, args)
+    return [_summary("render_template", "inprocess", {}, latencies, total, renders)]
+
+def case_generate_api(renders: int) -> List[dict]:
+    from fastapi.testclient import TestClient
+    from api.main import app
+    n = max(renders // 10, 10)
+    with TestClient(app) as client:
+        latencies, total = _measure(
+            lambda i: client.post("/api/v1/generate/post", json={"topic": f"sale {i}"}).raise_for_status(),
+            [(i,) for i in range(n)])
+    return [_summary("POST /generate/post", "asgi", {}, latencies, total, n)]
+
+def case_reputation(mentions: int) -> List[dict]:
+    from fastapi.testclient import TestClient
+    from api.main import app
+    from api.reputation import analyze_and_store
+    from bench.datasets import mentions as mention_stream
+    from db.database import SessionLocal
+    with SessionLocal() as db:
+        args = [(db, m["source"], m["url"], m["title"], m["text"]) for m in mention_stream(mentions)]
+        latencies, total = _measure(analyze_and_store, args)
+    results = [_summary("analyze_and_store", "inprocess", {}, latencies, total, mentions)]
+    with TestClient(app) as client:
+        stream = list(mention_stream(mentions, seed=5))
+        latencies, total = _measure(lambda m: client.post("/api/v1/reputation/analyze", json=m).raise_for_status(),
+                                    [(m,) for m in stream])
+        results.append(_summary("POST /reputation/analyze", "asgi", {}, latencies, total, mentions))
+        s_lat, s_total = _measure(lambda: client.get("/api/v1/reputation/summary").raise_for_status(),
+                                  [()] * 200)
+        results.append(_summary("GET /reputation/summary", "asgi", {}, s_lat, s_total, 200))
+    return results
+
+def case_rfm(customers: int, path: str) -> List[dict]:
+    from fastapi.testclient import TestClient
+    import api.analytics as analytics
+    from api.main import app
+    from db.database import SessionLocal
+    analytics.CUSTOMERS_PATH = path
+    results = []
+    with SessionLocal() as db:
+        for mode in ("full", "incremental"):
+            t = time.perf_counter()
+            analytics.run_rfm(db, mode=mode)
+            elapsed = time.perf_counter() - t
+            results.append(_summary(f"run_rfm[{mode}]", "inprocess", {"customers": customers},
+                                    [elapsed], elapsed, customers))
+    with TestClient(app) as client:
+        s_lat, s_total = _measure(lambda: client.get("/api/v1/analytics/summary").raise_for_status(), [()] * 200)
+        results.append(_summary("GET /analytics/summary", "asgi", {"customers": customers}, s_lat, s_total, 200))
+    return results
+
+CASES = {
+    "faq_match": case_faq_match,
+    "chat_api": case_chat_api,
+    "render": case_render,
+    "generate_api": case_generate_api,
+    "reputation": case_reputation,
+    "rfm": case_rfm,
+}
+
+def _child(case: str, kwargs: dict, db_path: str, queue) -> None:
+    os.environ["DATABASE_URL"] = f"sqlite:///{db_path}"
+    sys.stdout = sys.stderr  # keep stdout for the JSON report
+    try:
+        import api.models, db.models.models  # noqa: F401 - register the tables
+        from db.database import create_tables
+        create_tables()
+        results = CASES[case](**kwargs)
+        # ru_maxrss is KiB on Linux, bytes on macOS
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        rss_mb = rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+        for r in results:
+            r["peak_rss_mb"] = round(rss_mb, 1)
+        queue.put(("ok", results))
+    except Exception as e:
+        queue.put(("error", f"{type(e).__name__}: {e}"))
+
+def _wait_for_result(proc, queue, timeout: float) -> tuple:
+    """The child's (status, payload), or an error if it dies without one or outlives timeout"""
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            # Read before joining: a child with a large result can't exit until it's drained
+            return queue.get(timeout=min(1.0, max(deadline - time.monotonic(), 0.01)))
+        except Empty:
+            pass
+        if not proc.is_alive():
+            # It may have exited between the put and our last poll
+            try:
+                return queue.get(timeout=1.0)
+            except Empty:
+                return "error", f"child exited with code {proc.exitcode} without a result"
+        if time.monotonic() >= deadline:
+            return "error", f"timed out after {timeout:g}s"
+
+def run_case(case: str, kwargs: dict, workdir: str, timeout: float) -> List[dict]:
+    db_path = os.path.join(workdir, f"bench_{case}_{os.getpid()}_{time.monotonic_ns()}.db")
+    ctx = mp.get_context("spawn")
+    queue = ctx.Queue()
+    proc = ctx.Process(target=_child, args=(case, kwargs, db_path, queue))
+    proc.start()
+    try:
+        status, payload = _wait_for_result(proc, queue, timeout)
+    finally:
+        proc.join(1)
+        if proc.is_alive():
+            proc.kill()
+            proc.join()
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(db_path + suffix):
+                os.remove(db_path + suffix)
+    if status != "ok":
+        raise RuntimeError(f"{case} {kwargs}: {payload}")
+    return payload
+
+def plan(preset: dict, workdir: str) -> List[tuple]:
+    cases = []
+    for n in preset["faqs"]:
+        cases.append(("faq_match", {"faqs": n, "queries": preset["queries"]}))
+        cases.append(("chat_api", {"faqs": n, "queries": min(preset["queries"], 2_000)}))
+    cases.append(("render", {"renders": preset["renders"]}))
+    cases.append(("generate_api", {"renders": preset["renders"]}))
+    cases.append(("reputation", {"mentions": preset["mentions"]}))
+    for n in preset["customers"]:
+        cases.append(("rfm", {"customers": n, "path": os.path.join(workdir, f"customers_{n}.csv")}))
+    return cases
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True,
+                                       stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare(old_path: str, new_path: str) -> None:
+    """Print p50/p99 and throughput changes for cases present in both files"""
+    with open(old_path) as f:
+        old = {(r["name"], json.dumps(r["params"], sort_keys=True)): r for r in json.load(f)["results"]}
+    with open(new_path) as f:
+        new = json.load(f)["results"]
+    print(f"{'case':<48} {'p50 ms':>18} {'p99 ms':>18} {'throughput/s':>22}")
+    for r in new:
+        o = old.get((r["name"], json.dumps(r["params"], sort_keys=True)))
+        if o is None:
+            continue
+        label = f"{r['name']} {r['params']}"
+        cols = [f"{o[k]:.3f}->{r[k]:.3f}" for k in ("p50_ms", "p99_ms")]
+        cols.append(f"{o['throughput_per_s']:.1f}->{r['throughput_per_s']:.1f}")
+        print(f"{label:<48} {cols[0]:>18} {cols[1]:>18} {cols[2]:>22}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--preset", choices=PRESETS, default="small")
+    parser.add_argument("--cases", nargs="*", choices=CASES, help="only run these cases")
+    parser.add_argument("--workdir", default=os.path.join(tempfile.gettempdir(), "ai_store_bench"))
+    parser.add_argument("--out", help="write JSON results here (default: stdout)")
+    parser.add_argument("--case-timeout", type=float, default=3600,
+                        help="seconds before a case's process is killed and the case reported as failed")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="compare two result files and exit")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    os.makedirs(args.workdir, exist_ok=True)
+    results, failures = [], []
+    for case, kwargs in plan(PRESETS[args.preset], args.workdir):
+        if args.cases and case not in args.cases:
+            continue
+        path = kwargs.get("path")
+        if path and not os.path.exists(path):
+            from bench.datasets import write_customers_csv
+            print(f"generating {path}", file=sys.stderr)
+            write_customers_csv(path + ".tmp", kwargs["customers"])
+            os.replace(path + ".tmp", path)
+        print(f"running {case} {({k: v for k, v in kwargs.items() if k != 'path'})}", file=sys.stderr)
+        try:
+            results += run_case(case, kwargs, args.workdir, args.case_timeout)
+        except RuntimeError as e:
+            print(f"FAILED {e}", file=sys.stderr)
+            failures.append({"name": case, "params": {k: v for k, v in kwargs.items() if k != "path"},
+                             "error": str(e)})
+
+    report = {
+        "meta": {
+            "commit": _git_commit(),
+            "preset": args.preset,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "started_at": datetime.now(timezone.utc).isoformat(),
+        },
+        "results": results,
+        "failures": failures,
+    }
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    if failures:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+Benchmark the API served by gunicorn (gunicorn.conf.py) at several worker counts
+Usage: python -m bench.serve --workers 1 2 4 8 --out serve-results.json
+       python -m bench.run --compare old.json serve-results.json
+
+Each worker count gets a fresh SQLite database seeded with --faqs FAQs and
+its own shared cache directory. Concurrent clients then mix POST /chat with
+the polled dashboard summaries. After the load, one mention is posted and the
+summary is read back over new connections (which land on different workers);
+reads that don't see it are reported as stale_reads, so 0 means the
+invalidation reached every worker. Error responses are counted, not fatal.
+Results use bench.run's format.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Dict, List
+
+import httpx
+
+from bench.datasets import chat_queries
+from bench.run import _git_commit, _summary
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SEED = """
+import api.models, db.models.models
+from db.database import create_tables
+from bench.run import _seed_faqs
+create_tables()
+_seed_faqs({faqs})
+"""
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def _wait_for_workers(base: str, workers: int, timeout: float = 60.0) -> None:
+    """Until /health answers and every worker has served a request (seen by its pid)"""
+    deadline = time.monotonic() + timeout
+    pids = set()
+    while time.monotonic() < deadline:
+        try:
+            # A new connection per request, so gunicorn spreads them over the workers
+            with httpx.Client(base_url=base, timeout=5) as client:
+                pids.add(client.get("/api/v1/admin/shared-store").raise_for_status().json()["worker_pid"])
+        except httpx.HTTPError:
+            time.sleep(0.2)
+            continue
+        if len(pids) >= workers:
+            return
+    raise RuntimeError(f"only {len(pids)} of {workers} workers answered within {timeout}s")
+
+async def _load(base: str, queries: List[str], concurrency: int) -> tuple:
+    """Send every request once over concurrency keep-alive clients; (latencies, error responses) by endpoint"""
+    requests = []
+    for i, q in enumerate(queries):
+        requests.append(("POST /chat", "POST", "/api/v1/chat", {"message": q}))
+        if i % 4 == 0:
+            requests.append(("GET /analytics/summary", "GET", "/api/v1/analytics/summary", None))
+            requests.append(("GET /reputation/summary", "GET", "/api/v1/reputation/summary", None))
+    latencies: Dict[str, List[float]] = {}
+    errors: Dict[str, List[str]] = {}
+    pending = iter(requests)
+
+    async def client_loop():
+        async with httpx.AsyncClient(base_url=base, timeout=30) as client:
+            for name, method, path, body in pending:
+                t = time.perf_counter()
+                response = await client.request(method, path, json=body)
+                latencies.setdefault(name, []).append(time.perf_counter() - t)
+                if response.is_error:
+                    errors.setdefault(name, []).append(f"{response.status_code} {response.text[:200]}")
+
+    await asyncio.gather(*(client_loop() for _ in range(concurrency)))
+    return latencies, errors
+
+def _stale_reads(base: str, reads: int) -> int:
+    title = f"bench invalidation {time.time_ns()}"
+    with httpx.Client(base_url=base, timeout=10) as client:
+        client.post("/api/v1/reputation/analyze", json={
+            "source": "bench", "url": f"https://example.com/{title}", "title": title, "text": "great service"
+        }).raise_for_status()
+    stale = 0
+    for _ in range(reads):
+        with httpx.Client(base_url=base, timeout=10) as client:
+            newest = client.get("/api/v1/reputation/summary", params={"limit": 10}).raise_for_status().json()
+            stale += not newest or newest[0]["title"] != title
+    return stale
+
+def run_workers(workers: int, faqs: int, queries: int, concurrency: int, workdir: str) -> List[dict]:
+    run_dir = tempfile.mkdtemp(prefix=f"serve_{workers}_", dir=workdir)
+    port = _free_port()
+    env = {
+        **os.environ,
+        "DATABASE_URL": f"sqlite:///{os.path.join(run_dir, 'bench.db')}",
+        "CACHE_BACKEND": "file",
+        "CACHE_DIR": os.path.join(run_dir, "store"),
+        "WEB_CONCURRENCY": str(workers),
+        "APP_HOST": "127.0.0.1",
+        "APP_PORT": str(port),
+    }
+    subprocess.run([sys.executable, "-c", SEED.format(faqs=faqs)], cwd=ROOT, env=env, check=True,
+                   stdout=subprocess.DEVNULL)
+    base = f"http://127.0.0.1:{port}"
+    with open(os.path.join(run_dir, "gunicorn.log"), "w") as log:
+        server = subprocess.Popen([sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "api.main:app"],
+                                  cwd=ROOT, env=env, stdout=log, stderr=subprocess.STDOUT)
+        try:
+            _wait_for_workers(base, workers)
+            messages = chat_queries(queries, faqs)
+            # Warm every worker's FAQ matcher and the summaries before timing
+            asyncio.run(_load(base, messages[:workers * 20], concurrency))
+            start = time.perf_counter()
+            latencies, errors = asyncio.run(_load(base, messages, concurrency))
+            total = time.perf_counter() - start
+            stale = _stale_reads(base, reads=max(workers * 4, 10))
+        finally:
+            server.send_signal(signal.SIGTERM)
+            server.wait(timeout=60)
+    shutil.rmtree(run_dir, ignore_errors=True)
+
+    params = {"workers": workers, "faqs": faqs, "concurrency": concurrency}
+    everything = [l for lats in latencies.values() for l in lats]
+    results = [_summary("gunicorn mixed", "http", params, everything, total, len(everything),
+                        errors=sum(map(len, errors.values())), stale_reads=stale)]
+    for name, lats in sorted(latencies.items()):
+        # Endpoints share the wall clock, so their throughput is requests of that kind per second of the run
+        failed = errors.get(name, [])
+        results.append(_summary(name, "http", params, lats, total, len(lats), errors=len(failed),
+                                first_error=failed[0] if failed else None))
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--workers", nargs="+", type=int, default=[1, 2, 4, 8])
+    parser.add_argument("--faqs", type=int, default=1_000)
+    parser.add_argument("--queries", type=int, default=2_000, help="POST /chat requests per worker count")
+    parser.add_argument("--concurrency", type=int, default=32, help="concurrent keep-alive clients")
+    parser.add_argument("--workdir", default=os.path.join(tempfile.gettempdir(), "ai_store_bench"))
+    parser.add_argument("--out", help="write JSON results here (default: stdout)")
+    args = parser.parse_args()
+
+    os.makedirs(args.workdir, exist_ok=True)
+    results = []
+    for n in args.workers:
+        print(f"running gunicorn with {n} worker(s)", file=sys.stderr)
+        results += run_workers(n, args.faqs, args.queries, args.concurrency, args.workdir)
+
+    report = {
+        "meta": {
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "started_at": datetime.now(timezone.utc).isoformat(),
+        },
+        "results": results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+if __name__ == "__main__":
+    main()
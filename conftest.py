@@ -0,0 +1,14 @@
+"""Run the tests against a throwaway SQLite database, never the committed customer_ai.db"""
+
+import os
+import tempfile
+
+# Before anything imports db.database, which binds its engines at import time
+_tmp = tempfile.mkdtemp(prefix="ai_store_tests_")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmp, 'test.db')}"
+os.environ["CACHE_BACKEND"] = "memory"
+
+import api.models, db.models.models  # noqa: E402,F401 - register every table
+from db.database import create_tables  # noqa: E402
+
+create_tables()
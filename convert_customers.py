@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Convert customers.csv to Parquet or Arrow IPC for faster RFM runs
+Usage: python convert_customers.py data/customers.csv data/customers.parquet
+"""
+
+import argparse
+import os
+import sys
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from api.analytics import CUSTOMER_FORMATS, REQUIRED_COLUMNS
+
+# Explicit schema so every chunk (even an all-empty column) gets the same types
+SCHEMA = pa.schema([
+    ("id", pa.string()),
+    ("name", pa.string()),
+    ("email", pa.string()),
+    ("joined_at", pa.string()),
+    ("city", pa.string()),
+    ("age", pa.float64()),
+    ("last_purchase_at", pa.string()),
+    ("total_orders", pa.float64()),
+    ("total_spend", pa.float64()),
+])
+CSV_DTYPES = {field.name: ("float64" if pa.types.is_floating(field.type) else str) for field in SCHEMA}
+
+def convert(src: str, dst: str, fmt: str, chunk_size: int) -> int:
+    """Stream src CSV into dst chunk by chunk; returns rows written"""
+    header = pd.read_csv(src, nrows=0).columns
+    missing = set(REQUIRED_COLUMNS) - set(header)
+    if missing:
+        raise ValueError(f"{src} missing columns: {sorted(missing)}")
+
+    rows = 0
+    sink = pa.OSFile(dst, "wb")
+    writer = pq.ParquetWriter(sink, SCHEMA) if fmt == "parquet" else pa.ipc.new_file(sink, SCHEMA)
+    try:
+        for chunk in pd.read_csv(src, usecols=REQUIRED_COLUMNS, dtype=CSV_DTYPES, chunksize=chunk_size):
+            table = pa.Table.from_pandas(chunk[REQUIRED_COLUMNS], schema=SCHEMA, preserve_index=False)
+            writer.write_table(table)
+            rows += len(chunk)
+    finally:
+        writer.close()
+        sink.close()
+    return rows
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert customers.csv to Parquet or Arrow IPC")
+    parser.add_argument("src", help="input CSV")
+    parser.add_argument("dst", help="output file (.parquet, .arrow, .feather or .ipc)")
+    parser.add_argument("--format", choices=["parquet", "arrow"], help="default: from the output extension")
+    parser.add_argument("--chunk-size", type=int, default=500_000)
+    args = parser.parse_args()
+
+    fmt = args.format or CUSTOMER_FORMATS.get(os.path.splitext(args.dst)[1].lower())
+    if fmt not in ("parquet", "arrow"):
+        print("❌ Cannot tell the output format from the extension; pass --format")
+        sys.exit(1)
+
+    rows = convert(args.src, args.dst, fmt, args.chunk_size)
+    print(f"✅ Wrote {rows} rows to {args.dst} ({fmt})")
+    print(f"📋 Point the API at it with CUSTOMERS_PATH={args.dst}")
+
+if __name__ == "__main__":
+    main()
@@ -1,21 +1,144 @@
 import os
-from sqlalchemy import create_engine
+import threading
+import time
+from sqlalchemy import create_engine, event, exc, inspect
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 
-# SQLite database configuration
+from api.config import settings
+from api.metrics import instrument_engine
+
+# DATABASE_URL from the environment / .env; without one, the SQLite file at the repo root
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 DB_PATH = os.path.join(BASE_DIR, "..", "customer_ai.db")
-SQLALCHEMY_DATABASE_URL = f"sqlite:///{DB_PATH}"
+SQLALCHEMY_DATABASE_URL = settings.DATABASE_URL or f"sqlite:///{DB_PATH}"
+
+class PoolStats:
+    """Checkout wait times and connection churn for one engine's pool"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.checkout_wait_total = 0.0
+        self.checkout_wait_max = 0.0
+        self.checkout_timeouts = 0
+        self.connects = 0
+        self.pool = None
+
+    def on_connect(self, dbapi_connection, connection_record) -> None:
+        with self._lock:
+            self.connects += 1
+
+    def observe_checkout(self, waited: float, timed_out: bool = False) -> None:
+        with self._lock:
+            if timed_out:
+                self.checkout_timeouts += 1
+                return
+            self.checkouts += 1
+            self.checkout_wait_total += waited
+            self.checkout_wait_max = max(self.checkout_wait_max, waited)
+
+    def snapshot(self) -> dict:
+        pool = self.pool
+        counts = {}
+        if isinstance(pool, QueuePool):
+            counts = {
+                "size": pool.size(),
+                "checked_out": pool.checkedout(),
+                "checked_in": pool.checkedin(),
+                "overflow": max(pool.overflow(), 0),
+            }
+        with self._lock:
+            return {
+                **counts,
+                "connects": self.connects,
+                "checkouts": self.checkouts,
+                "checkout_timeouts": self.checkout_timeouts,
+                "checkout_wait_avg_ms": round(1000 * self.checkout_wait_total / self.checkouts, 3) if self.checkouts else 0.0,
+                "checkout_wait_max_ms": round(1000 * self.checkout_wait_max, 3),
+            }
+
+def _timed_pool(base, stats: PoolStats):
+    """Pool class that records how long each checkout waited for a connection"""
+    class TimedPool(base):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            stats.pool = self  # follows dispose(), which recreates the pool
+
+        def _do_get(self):
+            start = time.perf_counter()
+            try:
+                conn = super()._do_get()
+            except exc.TimeoutError:
+                stats.observe_checkout(time.perf_counter() - start, timed_out=True)
+                raise
+            stats.observe_checkout(time.perf_counter() - start)
+            return conn
+
+    return TimedPool
+
+def async_url(url: str) -> str:
+    """The same database through its asyncio driver (aiosqlite / asyncpg)"""
+    url = make_url(url)
+    backend = url.get_backend_name()
+    driver = {"sqlite": "aiosqlite", "postgresql": "asyncpg"}.get(backend)
+    if driver:
+        url = url.set(drivername=f"{backend}+{driver}")
+    return url.render_as_string(hide_password=False)
+
+def _engine_kwargs(url: str, pool_base, stats: PoolStats) -> dict:
+    url = make_url(url)
+    kwargs = {"echo": False}  # Set echo=True for debugging SQL queries
+    if url.get_backend_name() == "sqlite":
+        if url.database in (None, "", ":memory:"):
+            return kwargs  # single shared connection; no pool to tune
+        kwargs["connect_args"] = {"check_same_thread": False}  # Needed for SQLite
+    kwargs.update(
+        poolclass=_timed_pool(pool_base, stats),
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        pool_pre_ping=settings.DB_POOL_PRE_PING,
+    )
+    return kwargs
+
+pool_stats = {"sync": PoolStats("sync"), "async": PoolStats("async")}
 
-# Create engine with SQLite-specific settings
 engine = create_engine(
-    SQLALCHEMY_DATABASE_URL,
-    connect_args={"check_same_thread": False},  # Needed for SQLite
-    echo=False  # Set to True for debugging SQL queries
+    SQLALCHEMY_DATABASE_URL, **_engine_kwargs(SQLALCHEMY_DATABASE_URL, QueuePool, pool_stats["sync"])
 )
 
+# Async engine for the request handlers; the sync engine stays for scripts,
+# background jobs and the sync (plain def) endpoints
+ASYNC_DATABASE_URL = async_url(SQLALCHEMY_DATABASE_URL)
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URL, **_engine_kwargs(ASYNC_DATABASE_URL, AsyncAdaptedQueuePool, pool_stats["async"])
+)
+
+def _sqlite_on_connect(dbapi_connection, connection_record):
+    # WAL lets readers run alongside the writer; the busy timeout makes
+    # concurrent writers wait for the lock instead of failing with "database is locked"
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute(f"PRAGMA busy_timeout={int(settings.SQLITE_BUSY_TIMEOUT_MS)}")
+    cursor.execute(f"PRAGMA cache_size={int(settings.SQLITE_CACHE_SIZE)}")
+    cursor.execute(f"PRAGMA mmap_size={int(settings.SQLITE_MMAP_SIZE)}")
+    cursor.close()
+
+for _engine, _stats in ((engine, pool_stats["sync"]), (async_engine.sync_engine, pool_stats["async"])):
+    event.listen(_engine, "connect", _stats.on_connect)
+    instrument_engine(_engine, _stats.name)
+    if _engine.dialect.name == "sqlite":
+        event.listen(_engine, "connect", _sqlite_on_connect)
+
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
 Base = declarative_base()
 
 def get_db():
@@ -26,6 +149,45 @@ def get_db():
     finally:
         db.close()
 
+async def get_async_db():
+    """Async database session dependency"""
+    async with AsyncSessionLocal() as db:
+        yield db
+
+def dialect_insert(db, table):
+    """insert() for the session's dialect, which supports on_conflict_do_update (SQLite/Postgres)"""
+    if db.get_bind().dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert(table)
+
+def begin_immediate(db) -> None:
+    """On SQLite, open the session's transaction now, holding the write lock (BEGIN IMMEDIATE).
+
+    The sqlite3 module only begins a transaction at the first INSERT/UPDATE/DELETE,
+    so DDL would autocommit and earlier reads would fall outside it. For work
+    that must read and write (or swap tables) atomically; the lock waits on
+    busy_timeout. No-op on other databases or if a transaction is already open.
+    """
+    conn = db.connection()
+    if conn.dialect.name == "sqlite" and not conn.connection.dbapi_connection.in_transaction:
+        conn.exec_driver_sql("BEGIN IMMEDIATE")
+
+def add_missing_columns(table, *names: str) -> None:
+    """ALTER TABLE ... ADD COLUMN for model columns an existing table lacks, on every create_all().
+
+    create_all() only creates missing tables. Added columns must be nullable
+    or have a server default.
+    """
+    @event.listens_for(Base.metadata, "after_create")
+    def _add_columns(target, connection, **kw):
+        existing = {c["name"] for c in inspect(connection).get_columns(table.name)}
+        for name in names:
+            if name not in existing:
+                column_type = table.c[name].type.compile(dialect=connection.dialect)
+                connection.exec_driver_sql(f"ALTER TABLE {table.name} ADD COLUMN {name} {column_type}")
+
 # Create tables function
 def create_tables():
     """Create all database tables"""
@@ -5,8 +5,7 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from sqlalchemy import create_engine
 from dotenv import load_dotenv
 from db.database import SessionLocal, Base
-from db.models.models import FAQ
-from api.models import Feedback, ContentLog, CustomerScore, Mention
+from api.models import FAQ, Feedback, ContentLog, CustomerScore, Mention
 
 load_dotenv()
 
@@ -29,22 +28,22 @@ def init_database():
                     FAQ(
                         question="What are your business hours?",
                         answer="We are open Monday to Friday from 9 AM to 6 PM.",
-                        keywords=['hours', 'open', 'time', 'schedule']
+                        keywords_list=['hours', 'open', 'time', 'schedule']
                     ),
                     FAQ(
                         question="How can I contact support?",
                         answer="You can reach our support team at support@example.com or call 1-800-123-4567.",
-                        keywords=['contact', 'support', 'help', 'email', 'phone']
+                        keywords_list=['contact', 'support', 'help', 'email', 'phone']
                     ),
                     FAQ(
                         question="What payment methods do you accept?",
                         answer="We accept credit cards, PayPal, and bank transfers.",
-                        keywords=['payment', 'pay', 'credit', 'paypal', 'bank']
+                        keywords_list=['payment', 'pay', 'credit', 'paypal', 'bank']
                     ),
                     FAQ(
                         question="How do I return a product?",
                         answer="Returns can be processed within 30 days of purchase with original receipt.",
-                        keywords=['return', 'refund', 'exchange', 'product']
+                        keywords_list=['return', 'refund', 'exchange', 'product']
                     )
                 ]
 
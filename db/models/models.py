@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, Float, TIMESTAMP
+from sqlalchemy import Column, Integer, String, Text, Float, TIMESTAMP, DDL, event
 from sqlalchemy.sql import func
 
 # Import Base from database.py to share the same declarative base
@@ -12,3 +12,8 @@ class Message(Base):
     bot_response = Column(Text, nullable=False)
     confidence_score = Column(Float)
     timestamp = Column(TIMESTAMP, server_default=func.now())
+
+# Newest-first listing (/messages) walks this index backwards, cursor pages included
+event.listen(Base.metadata, "after_create", DDL(
+    "CREATE INDEX IF NOT EXISTS ix_messages_timestamp_id ON messages (timestamp, id)"
+))
@@ -0,0 +1,41 @@
+"""
+gunicorn settings for serving the API with several uvicorn worker processes
+Usage: gunicorn -c gunicorn.conf.py api.main:app
+       WEB_CONCURRENCY=4 gunicorn -c gunicorn.conf.py api.main:app
+
+Workers share the response cache, FAQ matcher snapshots and job status
+through the file store (CACHE_BACKEND=file, on /dev/shm unless CACHE_DIR is
+set), so an invalidation or FAQ reload in one worker reaches all of them.
+"""
+
+import multiprocessing
+import os
+
+# Set before any worker imports api.config
+os.environ.setdefault("CACHE_BACKEND", "file")
+
+bind = f"{os.getenv('APP_HOST', '0.0.0.0')}:{os.getenv('APP_PORT', '8000')}"
+workers = int(os.getenv("WEB_CONCURRENCY", str(min(multiprocessing.cpu_count(), 8))))
+worker_class = "uvicorn.workers.UvicornWorker"
+# The app is imported in each worker, after the fork: forked SQLite/asyncpg connections aren't safe to share
+preload_app = False
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "60"))
+# Time for the lifespan shutdown to drain the write-behind chat log
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", "30"))
+keepalive = 5
+errorlog = "-"
+accesslog = os.getenv("GUNICORN_ACCESS_LOG") or None
+
+def on_starting(server):
+    """Create the tables and backfill the KPI rollup once, in the master, so workers don't race each other's DDL"""
+    # Before api.config is imported: workers are forked with this process's settings
+    # already loaded, and their lifespan skips both steps when it is set. A failure
+    # below stops the master, so no worker ever starts on a missing schema.
+    os.environ["SCHEMA_READY"] = "1"
+    import api.models, db.models.models  # noqa: F401 - register every table
+    from api.kpis import ensure_convo_rollup
+    from db.database import SessionLocal, create_tables, engine
+    create_tables()
+    with SessionLocal() as db:
+        ensure_convo_rollup(db)
+    engine.dispose()  # no pooled connections carried into the forked workers
@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+"""
+Analyze and store mentions from a JSONL file (one {"title", "text", "url", "source"} per line)
+Usage: python ingest_mentions.py data/mentions.jsonl
+       some_exporter | python ingest_mentions.py - --workers 0
+"""
+
+import argparse
+import json
+import sys
+
+import api.models  # noqa: F401 - register the tables
+from api.config import settings
+from api.reputation import ingest_mentions, shutdown_analysis_pool
+from db.database import SessionLocal, create_tables
+
+def main():
+    parser = argparse.ArgumentParser(description="Analyze and store mentions from a JSONL file")
+    parser.add_argument("src", help="input JSONL file, or - for stdin")
+    parser.add_argument("--batch-size", type=int, default=settings.MENTION_BATCH_SIZE,
+                        help="records per INSERT transaction")
+    parser.add_argument("--workers", type=int, default=settings.MENTION_WORKERS,
+                        help="analysis processes (0: analyze in this process)")
+    parser.add_argument("--items", action="store_true", help="print every line's outcome, not just the counts")
+    args = parser.parse_args()
+
+    create_tables()
+    src = sys.stdin.buffer if args.src == "-" else open(args.src, "rb")
+    db = SessionLocal()
+    try:
+        progress = lambda n: print(f"⏳ {n} records", file=sys.stderr)
+        summary = ingest_mentions(db, src, batch_size=args.batch_size, workers=args.workers,
+                                  keep_items=args.items, progress=progress)
+    finally:
+        db.close()
+        src.close()
+        shutdown_analysis_pool()
+    print(json.dumps(summary, indent=2))
+    if summary["errors"]:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
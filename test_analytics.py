@@ -0,0 +1,139 @@
+import random
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+from api.analytics import (
+    _bucket_frequency, _bucket_monetary, _bucket_recency, _days_since,
+    _propensity, _score_frame, _segment,
+)
+
+
+def _reference_scores(df: pd.DataFrame) -> pd.DataFrame:
+    """The original per-row RFM loop from run_rfm"""
+    rows = []
+    for _, r in df.iterrows():
+        days = _days_since(str(r.get("last_purchase_at")))
+        r_score = _bucket_recency(days)
+        f_score = _bucket_frequency(int(r.get("total_orders", 0)))
+        m_score = _bucket_monetary(float(r.get("total_spend", 0.0)))
+        rows.append({
+            "user_id": str(r["id"]),
+            "r_score": r_score,
+            "f_score": f_score,
+            "m_score": m_score,
+            "propensity": float(_propensity(r_score, f_score, m_score)),
+            "segment": _segment(r_score, f_score, m_score, str(r.get("joined_at")), days),
+        })
+    return pd.DataFrame(rows)
+
+
+def _random_date(rng: random.Random, today: datetime) -> object:
+    kind = rng.random()
+    if kind < 0.05:
+        return None
+    if kind < 0.08:
+        return rng.choice(["", "not a date", "2025", "2025-8-1", "31/12/2024"])
+    d = today - timedelta(days=rng.randint(-5, 800), hours=rng.randint(0, 23))
+    if kind < 0.7:
+        return d.strftime("%Y-%m-%d")
+    if kind < 0.85:
+        return d.strftime("%Y-%m-%dT%H:%M:%S")
+    return d.strftime("%Y-%m-%dT%H:%M:%S") + rng.choice(["Z", "+05:30", "-08:00"])
+
+
+def _generate_customers(n: int, seed: int = 7) -> pd.DataFrame:
+    rng = random.Random(seed)
+    today = datetime.utcnow()
+    return pd.DataFrame({
+        "id": [f"C{i:06d}" for i in range(n)],
+        "name": [f"Customer {i}" for i in range(n)],
+        "email": [f"c{i}@example.com" for i in range(n)],
+        "joined_at": [_random_date(rng, today) for _ in range(n)],
+        "city": [rng.choice(["Delhi", "Mumbai", "Pune"]) for _ in range(n)],
+        "age": [rng.randint(18, 80) for _ in range(n)],
+        "last_purchase_at": [_random_date(rng, today) for _ in range(n)],
+        "total_orders": [rng.choice([0, 1, 2, 5, 6, 10, 11, 20, 21, rng.randint(0, 60)]) for _ in range(n)],
+        "total_spend": [rng.choice([0.0, 1999.99, 2000, 9999.5, 10000, 20000, 50000, 50000.01,
+                                    rng.uniform(0, 90_000)]) for _ in range(n)],
+    })
+
+
+def test_score_frame_matches_per_row_scoring():
+    df = _generate_customers(5000)
+    expected = _reference_scores(df)
+    actual = _score_frame(df)
+    pd.testing.assert_frame_equal(actual, expected, check_dtype=False)
+
+
+def test_score_frame_from_csv_round_trip(tmp_path):
+    path = tmp_path / "customers.csv"
+    _generate_customers(500, seed=11).to_csv(path, index=False)
+    df = pd.read_csv(path)
+    pd.testing.assert_frame_equal(_score_frame(df), _reference_scores(df), check_dtype=False)
+
+
+def _stored_scores() -> pd.DataFrame:
+    from api.models import CustomerScore
+    from db.database import SessionLocal
+    with SessionLocal() as db:
+        rows = db.query(CustomerScore.user_id, CustomerScore.r_score, CustomerScore.f_score,
+                        CustomerScore.m_score, CustomerScore.propensity, CustomerScore.segment).all()
+    df = pd.DataFrame(rows, columns=["user_id", "r_score", "f_score", "m_score", "propensity", "segment"])
+    return df.sort_values("user_id", ignore_index=True)
+
+
+def test_incremental_run_matches_full_run(tmp_path, monkeypatch):
+    import api.analytics as analytics
+    from db.database import SessionLocal
+    path = tmp_path / "customers.csv"
+    monkeypatch.setattr(analytics, "CUSTOMERS_PATH", str(path))
+    df = _generate_customers(3000, seed=13)
+    df.to_csv(path, index=False)
+    with SessionLocal() as db:
+        analytics.run_rfm(db, mode="full", chunk_size=700)
+
+    # Change some customers' inputs and append new ones
+    rng = random.Random(5)
+    changed = rng.sample(range(len(df)), 200)
+    df.loc[changed, "total_orders"] = [rng.randint(0, 40) for _ in changed]
+    df.loc[changed[:100], "total_spend"] = [rng.uniform(0, 90_000) for _ in changed[:100]]
+    df.loc[changed[100:], "last_purchase_at"] = datetime.utcnow().strftime("%Y-%m-%d")
+    extra = _generate_customers(3500, seed=14).iloc[3000:]
+    pd.concat([df, extra]).to_csv(path, index=False)
+
+    with SessionLocal() as db:
+        result = analytics.run_rfm(db, mode="incremental", chunk_size=700)
+    assert result["rescored"] < result["scanned"] == 3500
+    incremental = _stored_scores()
+    with SessionLocal() as db:
+        analytics.run_rfm(db, mode="full", chunk_size=700)
+    pd.testing.assert_frame_equal(incremental, _stored_scores(), check_dtype=False)
+
+
+def test_full_run_lets_other_writers_in_between_batches(tmp_path, monkeypatch):
+    import sqlite3
+    import api.analytics as analytics
+    from db.database import SessionLocal, engine
+    path = tmp_path / "customers.csv"
+    monkeypatch.setattr(analytics, "CUSTOMERS_PATH", str(path))
+    _generate_customers(2000, seed=17).to_csv(path, index=False)
+
+    # Another connection that won't wait: it fails if the run still holds the write lock
+    other = sqlite3.connect(engine.url.database, timeout=0.05)
+    writes = []
+
+    def progress(rows):
+        other.execute("INSERT INTO id_blocks (name, next_id) VALUES (?, 1)", (f"rfm-test-{rows}",))
+        other.commit()
+        writes.append(rows)
+
+    try:
+        with SessionLocal() as db:
+            result = analytics.run_rfm(db, mode="full", chunk_size=500, progress=progress)
+    finally:
+        other.execute("DELETE FROM id_blocks WHERE name LIKE 'rfm-test-%'")
+        other.commit()
+        other.close()
+    assert writes == [500, 1000, 1500, 2000]
+    assert result["total"] == 2000
@@ -0,0 +1,135 @@
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import delete, insert
+
+from api.main import app
+from db.database import SessionLocal
+from db.models.models import Message
+
+
+@pytest.fixture(scope="module")
+def client():
+    with TestClient(app) as c:
+        yield c
+
+
+def _mention(n: int) -> dict:
+    return {"source": "test", "url": f"https://example.com/t/{n}", "title": f"mention {n}",
+            "text": "great fast delivery"}
+
+
+def test_summary_etag_304_until_a_write(client):
+    client.post("/api/v1/reputation/analyze", json=_mention(1)).raise_for_status()
+    first = client.get("/api/v1/reputation/summary")
+    assert first.status_code == 200
+    etag = first.headers["ETag"]
+
+    cached = client.get("/api/v1/reputation/summary", headers={"If-None-Match": etag})
+    assert cached.status_code == 304
+    assert cached.content == b""
+    assert client.get("/api/v1/reputation/summary",
+                      headers={"If-Modified-Since": first.headers["Last-Modified"]}).status_code == 304
+
+    # A new mention invalidates the "mentions" tag: the same ETag no longer matches
+    client.post("/api/v1/reputation/analyze", json=_mention(2)).raise_for_status()
+    fresh = client.get("/api/v1/reputation/summary", headers={"If-None-Match": etag})
+    assert fresh.status_code == 200
+    assert fresh.headers["ETag"] != etag
+    assert fresh.json()[0]["title"] == "mention 2"
+
+
+def test_message_cursors_walk_every_row_once(client):
+    base = datetime(2026, 1, 1)
+    with SessionLocal() as db:
+        db.execute(delete(Message))
+        # Repeated timestamps, so pages must break ties on id
+        db.execute(insert(Message), [
+            {"user_message": f"m{i}", "bot_response": "r", "confidence_score": 0.0,
+             "timestamp": base + timedelta(minutes=i // 3)}
+            for i in range(47)
+        ])
+        db.commit()
+
+    seen, cursor, pages = [], None, 0
+    while True:
+        params = {"limit": 5, **({"cursor": cursor} if cursor else {})}
+        response = client.get("/api/v1/messages", params=params)
+        assert response.status_code == 200
+        seen += [(m["timestamp"], m["id"]) for m in response.json()]
+        pages += 1
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            break
+
+    assert pages == 10
+    assert len(seen) == len(set(seen)) == 47
+    assert seen == sorted(seen, reverse=True)
+
+
+@pytest.mark.parametrize("path", ["/api/v1/messages", "/api/v1/reputation/summary"])
+def test_bad_cursor_is_400(client, path):
+    for cursor in ("not-a-cursor", "eyJ0IjoxfQ"):
+        assert client.get(path, params={"cursor": cursor}).status_code == 400
+
+
+def test_chat_batch_ids_follow_input_order(client):
+    messages = [f"where is my order {i}?" if i % 2 else f"refund price {i}" for i in range(300)]
+    response = client.post("/api/v1/chat/batch", json={"messages": messages})
+    assert response.status_code == 200
+    results = response.json()["results"]
+    ids = [r["message_id"] for r in results]
+    assert len(set(ids)) == len(messages)
+
+    with SessionLocal() as db:
+        stored = {m.id: m for m in db.query(Message).filter(Message.id.in_(ids))}
+    assert [stored[i].user_message for i in ids] == messages
+    assert [stored[i].bot_response for i in ids] == [r["response"] for r in results]
+
+    # Same answer as the single-message endpoint
+    single = client.post("/api/v1/chat", json={"message": messages[1]}).json()
+    assert (single["response"], single["confidence_score"]) == (results[1]["response"], results[1]["confidence_score"])
+
+
+@pytest.mark.parametrize("count, status", [(0, 422), (1, 200), (1000, 200), (1001, 422)])
+def test_chat_batch_size_limits(client, count, status):
+    response = client.post("/api/v1/chat/batch", json={"messages": [f"hello {i}" for i in range(count)]})
+    assert response.status_code == status
+    if status == 200:
+        assert len(response.json()["results"]) == count
+
+
+def test_generated_text_is_stored_once_per_hash(client):
+    from api.models import ContentBlob, ContentLog
+    payload = {"topic": "blob dedupe", "tone": "bold"}
+    first = client.post("/api/v1/generate/post", json=payload).json()
+    second = client.post("/api/v1/generate/post", json=payload).json()
+    assert first["text"] == second["text"]
+    digest = first["meta"]["output_hash"]
+    assert second["meta"]["output_hash"] == digest and first["meta"]["id"] != second["meta"]["id"]
+
+    batch = client.post("/api/v1/generate/batch", json={"items": [
+        {"kind": "post", **payload}, {"kind": "slogan", "topic": "blob dedupe"}, {"kind": "post", **payload},
+    ]})
+    assert batch.status_code == 200
+    results = batch.json()["results"]
+    assert [r["meta"]["type"] for r in results] == ["post", "slogan", "post"]
+    assert results[0]["meta"]["output_hash"] == results[2]["meta"]["output_hash"] == digest
+    assert results[1]["meta"]["output_hash"] != digest
+
+    with SessionLocal() as db:
+        assert db.query(ContentBlob).filter(ContentBlob.hash == digest).one().text == first["text"]
+        logs = db.query(ContentLog).filter(ContentLog.output_hash == digest).order_by(ContentLog.id).all()
+    assert [log.id for log in logs] == [first["meta"]["id"], second["meta"]["id"],
+                                        results[0]["meta"]["id"], results[2]["meta"]["id"]]
+    assert all(log.output == "" and log.inputs["topic"] == "blob dedupe" for log in logs)
+
+
+def test_admin_skips_templates_and_lexicons_on_workers_without_their_router(client, monkeypatch):
+    import api.main
+    assert client.get("/api/v1/admin/templates").status_code == 200
+    monkeypatch.setattr(api.main, "ENABLED", ["chat", "admin"])
+    for path in ("/api/v1/admin/templates", "/api/v1/admin/lexicons"):
+        assert client.get(path).status_code == 404
+    assert client.post("/api/v1/admin/templates/reload").status_code == 404
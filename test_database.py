@@ -0,0 +1,19 @@
+from sqlalchemy import func, select
+
+from db.database import SessionLocal
+from db.models.models import Message
+
+
+def _message(text: str) -> Message:
+    return Message(user_message=text, bot_response="r", confidence_score=50.0)
+
+
+def test_read_then_write_survives_a_concurrent_commit():
+    # A read must not pin a snapshot that a later write in the same session conflicts with
+    with SessionLocal() as a, SessionLocal() as b:
+        before = a.scalar(select(func.count()).select_from(Message))
+        b.add(_message("from b"))
+        b.commit()
+        a.add(_message("from a"))
+        a.commit()
+        assert a.scalar(select(func.count()).select_from(Message)) == before + 2
@@ -0,0 +1,113 @@
+import json
+import random
+
+import pytest
+from sqlalchemy import delete
+
+from api.faq_service import BM25Matcher, FAQCache, FAQMatcher, FAQService, KeywordMatcher
+from api.models import FAQ
+from bench.datasets import chat_queries, faq_rows
+from db.database import SessionLocal
+
+
+def _faqs(n: int, seed: int = 0) -> list:
+    return [FAQ(id=i + 1, **row) for i, row in enumerate(faq_rows(n, seed=seed))]
+
+
+def _reference_match(faqs: list, message: str):
+    """The original find_best_match: a scan in id order, a later FAQ wins only with a strictly higher score"""
+    service = FAQService(db=None)
+    user_words = service.preprocess_text(message)
+    best_id, best_confidence = None, 0.0
+    for faq in faqs:
+        confidence = service.calculate_confidence(user_words, faq.keywords_list)
+        if confidence > best_confidence:
+            best_id, best_confidence = faq.id, confidence
+    return best_id, best_confidence
+
+
+def test_keyword_matcher_matches_reference_scan():
+    faqs = _faqs(1000)
+    matcher = KeywordMatcher.from_faqs(faqs)
+    service = FAQService(db=None)
+    for message in chat_queries(300, 1000) + ["", "nothing in common", "price price price"]:
+        expected_id, expected_confidence = _reference_match(faqs, message)
+        best = matcher.top_k(service.preprocess_text(message), 1)
+        if expected_id is None:
+            assert best == []
+        else:
+            assert best[0][0] == expected_id, message
+            assert best[0][2] == pytest.approx(expected_confidence)
+
+
+def test_keyword_matcher_ties_go_to_lowest_id():
+    faqs = [
+        FAQ(id=7, question="q7", answer="seven", keywords=json.dumps(["refund", "order"])),
+        FAQ(id=3, question="q3", answer="three", keywords=json.dumps(["refund", "order"])),
+        FAQ(id=5, question="q5", answer="five", keywords=json.dumps(["refund", "status"])),
+    ]
+    matcher = KeywordMatcher.from_faqs(faqs)
+    assert matcher.match(["refund"]) == ("three", 50.0)
+    assert [m[0] for m in matcher.top_k(["refund"], 3)] == [3, 5, 7]
+    assert _reference_match(sorted(faqs, key=lambda f: f.id), "refund") == (3, 50.0)
+
+
+def test_bm25_ranks_the_relevant_faq_first():
+    faqs = [
+        FAQ(id=1, question="How long does shipping take?", answer="shipping",
+            keywords=json.dumps(["shipping", "delivery", "time"])),
+        FAQ(id=2, question="How do I get a refund for my order?", answer="refund",
+            keywords=json.dumps(["refund", "return", "money"])),
+        FAQ(id=3, question="How can I reset my password?", answer="password",
+            keywords=json.dumps(["password", "reset", "login"])),
+    ]
+    matcher = BM25Matcher.from_faqs(faqs)
+    service = FAQService(db=None)
+    top = matcher.top_k(service.preprocess_text("I forgot my password, how do I reset it?"), 3)
+    assert top[0][0] == 3
+    assert 0 < top[0][2] <= 100
+    assert matcher.match(service.preprocess_text("when will my delivery arrive"))[0] == "shipping"
+    assert matcher.top_k(service.preprocess_text("unrelated words only"), 3) == []
+
+
+@pytest.mark.parametrize("mode", ["keyword", "bm25"])
+def test_change_feed_updates_match_a_full_rebuild(mode):
+    rng = random.Random(3)
+    with SessionLocal() as db:
+        db.execute(delete(FAQ))
+        db.add_all(FAQ(**row) for row in faq_rows(300, seed=9))
+        db.commit()
+
+        cache = FAQCache(matcher=mode, check_interval=0)
+        cache.get_matcher(db)
+        rows = db.query(FAQ).order_by(FAQ.id).all()
+        for faq in rng.sample(rows, 20):
+            faq.keywords = json.dumps(rng.sample(["price", "refund", "delivery", "kw3", "kw7", "kw11"], 3))
+        for faq in rng.sample(rows, 10):
+            db.delete(faq)
+        db.add_all(FAQ(**row) for row in faq_rows(15, seed=10))
+        db.commit()
+
+        incremental = cache.get_matcher(db)
+        assert cache.incremental_refreshes == 1 and cache.full_builds == 1
+        rebuilt = FAQCache(matcher=mode, check_interval=0).get_matcher(db)
+        assert len(incremental) == len(rebuilt)
+        service = FAQService(db)
+        for message in chat_queries(300, 300) + ["price refund", "delivery kw3 kw7"]:
+            words = service.preprocess_text(message)
+            expected = rebuilt.top_k(words, 5)
+            actual = incremental.top_k(words, 5)
+            assert [m[0] for m in actual] == [m[0] for m in expected], message
+            assert [m[2] for m in actual] == pytest.approx([m[2] for m in expected])
+
+
+def test_incomplete_matcher_fails_at_construction():
+    class NoTopK(FAQMatcher):
+        def add(self, faq):
+            pass
+
+        def remove(self, faq_id):
+            pass
+
+    with pytest.raises(TypeError, match="top_k"):
+        NoTopK.from_faqs(_faqs(3))
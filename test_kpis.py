@@ -0,0 +1,51 @@
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import delete, select
+
+from api.kpis import convo_kpis, rebuild_convo_rollup, record_feedback, record_messages
+from api.models import ConvoRollup, Feedback
+from db.database import SessionLocal
+from db.models.models import Message
+
+HOUR = datetime(2026, 3, 1, 10)
+
+
+def _rollup(db) -> dict:
+    rows = db.execute(select(ConvoRollup).order_by(ConvoRollup.bucket_start)).scalars()
+    return {r.bucket_start: (r.message_count, r.low_confidence_count, r.confidence_sum, r.confidence_count,
+                             r.feedback_total, r.feedback_helpful) for r in rows}
+
+
+def test_rebuild_merges_messages_and_feedback_in_the_same_hour():
+    with SessionLocal() as db:
+        for table in (Message, Feedback, ConvoRollup):
+            db.execute(delete(table))
+        messages = [(HOUR + timedelta(minutes=5), 80.0), (HOUR + timedelta(minutes=50), 10.0),
+                    (HOUR + timedelta(hours=1, minutes=1), None)]
+        db.add_all(Message(user_message="q", bot_response="a", confidence_score=c, timestamp=t) for t, c in messages)
+        # Feedback timestamps are timezone-aware; the rollup keys everything by naive UTC hour
+        feedback = [(HOUR + timedelta(minutes=20), True), (HOUR + timedelta(minutes=40), False),
+                    (HOUR + timedelta(hours=2), True)]
+        db.add_all(Feedback(message_id=1, helpful=h, created_at=t.replace(tzinfo=timezone.utc)) for t, h in feedback)
+        db.commit()
+
+        # The same counts as the API keeps on write
+        for t, c in messages:
+            record_messages(db, [c], at=t)
+        for t, h in feedback:
+            record_feedback(db, h, at=t)
+        db.commit()
+        on_write = _rollup(db)
+
+        assert rebuild_convo_rollup(db) == 3
+        rebuilt = _rollup(db)
+        assert rebuilt == on_write
+        assert rebuilt[HOUR] == (2, 1, 90.0, 2, 2, 1)
+        assert rebuilt[HOUR + timedelta(hours=1)] == (1, 0, 0.0, 0, 0, 0)
+        assert rebuilt[HOUR + timedelta(hours=2)] == (0, 0, 0.0, 0, 1, 1)
+
+        # A partial rebuild leaves earlier buckets alone
+        assert rebuild_convo_rollup(db, since=HOUR + timedelta(hours=1)) == 2
+        assert _rollup(db) == rebuilt
+        assert convo_kpis(db) == {"window": "all", "total": 3, "escalation_rate": 0.3333,
+                                  "avg_confidence": 45.0, "helpful_rate": 0.6667}
@@ -0,0 +1,85 @@
+import json
+import os
+import random
+
+import pytest
+
+from api.lexicon import Lexicon, LexiconStore
+
+LEXICON_PATH = os.path.join(os.path.dirname(__file__), "api", "lexicons.json")
+
+
+# The substring checks the lexicon replaced (api/reputation.py before the automaton)
+def _reference_sentiment(text: str) -> float:
+    if not text:
+        return 0.0
+    text_l = text.lower()
+    negatives = ["fraud", "scam", "fake", "bad", "angry", "delay", "poor", "hate", "cheat", "complaint"]
+    positives = ["great", "good", "happy", "fast", "love", "excellent", "smooth", "trust", "reliable"]
+    score = 0
+    for w in positives:
+        if w in text_l: score += 1
+    for w in negatives:
+        if w in text_l: score -= 1
+    return max(-1.0, min(1.0, score / 3.0))
+
+
+def _reference_topic(text: str) -> str:
+    if not text: return "general"
+    t = text.lower()
+    if "delivery" in t: return "delivery"
+    if "price" in t or "cost" in t: return "pricing"
+    if "support" in t or "service" in t: return "support"
+    if "return" in t or "refund" in t: return "returns"
+    return "general"
+
+
+def _reference_misinfo(text: str) -> bool:
+    if not text: return False
+    t = text.lower()
+    return any(kw in t for kw in ["rumor", "fake news", "unverified", "hoax"])
+
+
+def _texts(n: int, seed: int = 0) -> list:
+    rng = random.Random(seed)
+    words = ["great", "GOOD", "fast", "Scam", "fake", "fake news", "badge", "hate", "cheater", "refund",
+             "returned", "customer service", "costly", "price", "delivery", "rumors", "hoax", "unverified",
+             "trustworthy", "smoothly", "order", "the", "my", "was", "and", "!", "delayed", "complaints"]
+    texts = ["", " ", "nothing relevant here"]
+    for _ in range(n):
+        texts.append(rng.choice([" ", "", ", "]).join(rng.choices(words, k=rng.randint(1, 12))))
+    return texts
+
+
+def test_lexicon_matches_substring_checks():
+    with open(LEXICON_PATH, encoding="utf-8") as f:
+        lexicon = Lexicon(json.load(f))
+    for text in _texts(3000):
+        signals = lexicon.scan(text)
+        assert signals.sentiment == pytest.approx(_reference_sentiment(text)), text
+        assert signals.topic == _reference_topic(text), text
+        assert signals.is_misinfo == _reference_misinfo(text), text
+
+
+def test_store_reloads_an_edited_file(tmp_path):
+    path = tmp_path / "lexicons.json"
+    config = {"sentiment": {"scale": 3.0, "positive": ["great"], "negative": ["bad"]},
+              "topics": [{"name": "delivery", "terms": ["delivery"]}], "default_topic": "general", "misinfo": []}
+    path.write_text(json.dumps(config))
+    store = LexiconStore(path=str(path), check_interval=0)
+    assert store.get().scan("a superb courier").topic == "general"
+
+    config["topics"].append({"name": "shipping", "terms": ["courier"]})
+    config["sentiment"]["positive"].append("superb")
+    path.write_text(json.dumps(config))
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))  # a distinct mtime on coarse clocks
+    signals = store.get().scan("a superb courier")
+    assert (signals.topic, signals.sentiment) == ("shipping", pytest.approx(1 / 3))
+    assert store.loads == 2
+
+    # A broken edit keeps the last good lexicon in service
+    path.write_text("{not json")
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 2_000_000_000))
+    assert store.get().scan("a superb courier").topic == "shipping"
+    assert store.last_error is not None
@@ -0,0 +1,99 @@
+import json
+import threading
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import select
+
+import api.routers.feedback as feedback
+from api.main import app
+from api.message_log import MessageLog
+from db.database import SessionLocal
+from db.models.models import Message
+
+
+def _rows(n: int, prefix: str = "m") -> list:
+    return [{"user_message": f"{prefix}{i}", "bot_response": "r", "confidence_score": float(i)} for i in range(n)]
+
+
+def _stored(ids: list) -> list:
+    with SessionLocal() as db:
+        return db.execute(
+            select(Message.id, Message.user_message).where(Message.id.in_(ids)).order_by(Message.id)
+        ).all()
+
+
+def test_rows_land_in_order_with_their_ids():
+    log = MessageLog(enabled=True, batch_size=4, flush_interval=0.05)
+    log.start()
+    ids = []
+    for call in range(5):
+        ids += log.log(_rows(3, prefix=f"c{call}-"))
+    log.stop()
+
+    assert ids == sorted(ids) and len(set(ids)) == 15
+    assert [m for _, m in _stored(ids)] == [f"c{call}-{i}" for call in range(5) for i in range(3)]
+    assert log.stats()["flushed"] == 15 and log.stats()["pending"] == 0
+
+
+def test_stop_drains_the_queue():
+    log = MessageLog(enabled=True, batch_size=1000, flush_interval=0.5)
+    log.start()
+    ids = log.log(_rows(50))
+    assert log.pending(ids[0])["user_message"] == "m0"
+    log.stop()
+    assert len(_stored(ids)) == 50
+    assert log.pending(ids[0]) is None
+
+
+def test_rows_that_cannot_be_written_are_dead_lettered(tmp_path):
+    dead_letter = tmp_path / "dead.jsonl"
+    log = MessageLog(enabled=True, flush_interval=0.05, max_retries=1, dead_letter_path=str(dead_letter))
+    ids = log.log(_rows(3))
+    # A row inserted behind the allocator's back takes an id that is queued but not yet written
+    with SessionLocal() as db:
+        db.add(Message(id=ids[1], user_message="direct", bot_response="r"))
+        db.commit()
+    log.start()
+    log.stop()
+
+    assert [m for _, m in _stored(ids)] == ["m0", "direct", "m2"]
+    [dead] = [json.loads(line) for line in dead_letter.read_text().splitlines()]
+    assert (dead["id"], dead["user_message"]) == (ids[1], "m1") and "UNIQUE" in dead["error"]
+    stats = log.stats()
+    assert (stats["flushed"], stats["dead_lettered"], stats["pending"]) == (2, 1, 0)
+
+
+@pytest.fixture
+def worker_log(monkeypatch):
+    """This worker's (empty) write-behind log, as the feedback router sees it"""
+    log = MessageLog(enabled=True, flush_interval=0.05)
+    monkeypatch.setattr(feedback, "message_log", log)
+    return log
+
+
+def test_feedback_waits_for_a_message_queued_in_another_worker(worker_log):
+    other = MessageLog(enabled=True, flush_interval=0.05)
+    [message_id] = other.log(_rows(1))
+    assert worker_log.pending(message_id) is None and not _stored([message_id])
+
+    # The other worker flushes while this one's request is waiting
+    flusher = threading.Timer(0.3, other.start)
+    flusher.start()
+    try:
+        with TestClient(app) as client:
+            response = client.post("/api/v1/feedback", json={"message_id": message_id, "helpful": True})
+            assert response.status_code == 200
+            assert client.post("/api/v1/feedback",
+                               json={"message_id": message_id + 10_000, "helpful": True}).status_code == 404
+    finally:
+        flusher.join()
+        other.stop()
+
+
+def test_feedback_accepts_a_message_still_in_this_workers_queue(worker_log):
+    [message_id] = worker_log.log(_rows(1))
+    with TestClient(app) as client:
+        response = client.post("/api/v1/feedback", json={"message_id": message_id, "helpful": False})
+    assert response.status_code == 200
+    assert not _stored([message_id])  # answered before the row was written